@@ -1,17 +1,59 @@
+import os
+import asyncio
+import json
+from contextlib import asynccontextmanager
 import numpy as np
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-from typing import Dict
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, PositiveFloat
+from typing import Dict, List, Optional, Union
 
 # 从我们现有的模块中导入核心计算函数和常量
-from calculator import calculate_z_factor_bisection
-from constants import N # 气体组分总数，应为 21
+from calculator import calculate_z_factor_bisection, calculate_z_factor_newton
+from calculator_batch import calculate_z_factor_batch, calculate_z_factor_matrix, calculate_z_factor_blend
+from calculator_numba import calculate_z_factor_numba
+from calculator_pure import calculate_z_factor_linear_scan
+from z_table_store import calculate_z_factor_table
+from flow import convert_to_standard_flow, standard_flow
+from properties import solve_with_properties
+from cache import ResultCache
+from worker_pool import SolverPool, PoolSaturated
+from jobs import JobManager, JobQueueFull, JobTracer
+from tracing import TRACE_OFF, TRACE_ITERATIONS
+from constants import N, M # 气体组分总数 (应为 21) 及各组分摩尔质量
+
+# --- 求解器执行池配置 (可通过环境变量调整) ---
+# AGA8_WORKERS > 0 时求解器调用分发到进程池；AGA8_MAX_PENDING 为排队上限，超出时返回 503
+SOLVER_POOL = SolverPool(
+    workers=int(os.environ.get("AGA8_WORKERS", "0")),
+    max_pending=int(os.environ.get("AGA8_MAX_PENDING", "0")),
+)
+
+# --- 后台任务配置 ---
+# 任务在本进程的线程中运行 (以便报告进度和取消)，不经过 SOLVER_POOL
+JOB_MANAGER = JobManager(
+    concurrency=int(os.environ.get("AGA8_JOB_CONCURRENCY", "2")),
+    max_queued=int(os.environ.get("AGA8_JOB_MAX_QUEUED", "100")),
+    retention=float(os.environ.get("AGA8_JOB_RETENTION", "3600")),  # 秒
+    max_retained=int(os.environ.get("AGA8_JOB_MAX_RETAINED", "200")),
+)
+JOB_MAX_POINTS = int(os.environ.get("AGA8_JOB_MAX_POINTS", "1000000"))
+# /calculate/matrix 单次请求的最大点数 (组分行数 x 工况点数)
+MATRIX_MAX_POINTS = int(os.environ.get("AGA8_MATRIX_MAX_POINTS", "1000000"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    SOLVER_POOL.start()
+    yield
+    await JOB_MANAGER.shutdown()
+    SOLVER_POOL.shutdown()
 
 # --- API 应用定义 ---
 app = FastAPI(
     title="天然气压缩因子计算服务 (本地AGA8核心)",
     description="一个API，其接口与CoolProp/refer/main.py示例兼容，但使用本地的AGA8-92DC算法进行计算。",
     version="3.0.0-final",
+    lifespan=lifespan,
 )
 
 # --- 权威的内部映射与常量 ---
@@ -34,17 +76,135 @@ INTERNAL_NAME_TO_INDEX_MAP = {
     "He": 19, "Ar": 20
 }
 
+# 映射3: API可选的求解方法
+SOLVERS = {
+    "bisection": calculate_z_factor_bisection,
+    "newton": calculate_z_factor_newton,
+    "numba": calculate_z_factor_numba,  # 未安装 numba 时自动退化为 newton
+    "table": calculate_z_factor_table,  # 查 AGA8_ZTABLE_DIR 中预计算的 Z 表，无表或超出包络时退化为 newton
+}
+
+# 后台任务额外支持线性扫描法 (耗时长，只适合以任务形式运行) 和向量化批量求解
+JOB_SOLVERS = dict(SOLVERS, linear_scan=calculate_z_factor_linear_scan, batch=calculate_z_factor_batch)
+
+# --- 结果缓存配置 (可通过环境变量调整) ---
+# 组分、温度、压力按各自的分辨率量化后作为缓存键；缓存容量为 0 时禁用缓存
+CACHE_MAXSIZE = int(os.environ.get("AGA8_CACHE_SIZE", "4096"))
+CACHE_TTL = float(os.environ.get("AGA8_CACHE_TTL", "0"))  # 秒，0 表示永不过期
+CACHE_T_RESOLUTION = float(os.environ.get("AGA8_CACHE_T_RESOLUTION", "0.001"))  # K
+CACHE_P_RESOLUTION = float(os.environ.get("AGA8_CACHE_P_RESOLUTION", "0.001"))  # kPa
+CACHE_X_RESOLUTION = float(os.environ.get("AGA8_CACHE_X_RESOLUTION", "1e-9"))  # 摩尔分数
+
+RESULT_CACHE = ResultCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+
 # --- API 模型定义 (与 refer/main.py 完全一致) ---
 
 class CalculationRequest(BaseModel):
     base_components: Dict[str, float] = Field(..., example={"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05})
     hydrogen_fraction: float = Field(0.0, ge=0.0, le=1.0, description="氢气的摩尔分数")
-    T: float = Field(..., example=288.15, description="温度 (K)")
+    T: float = Field(..., gt=0, example=288.15, description="温度 (K)")
     P_kPa: float = Field(..., example=1013.25, description="压力 (kPa)")
+    solver: str = Field("bisection", example="newton", description="求解方法: bisection (二分法)、newton (牛顿法)、numba (Numba 编译的牛顿法) 或 table (预计算 Z 表插值)")
+    properties: bool = Field(False, description="是否同时返回导出性质 (密度、dZ/dP、dZ/dT 等，见 properties.StateProperties)；查表法不支持")
 
 class CalculationResponse(BaseModel):
     final_components: Dict[str, float]
     compression_factor: float
+    properties: Optional[Dict[str, float]] = Field(None, description="导出性质，仅在请求 properties=true 时返回")
+
+class FlowCalculationRequest(BaseModel):
+    """流量换算请求: 同一组分下的工况条件、标况条件及工况流量 (单个值或数组)。"""
+    base_components: Dict[str, float] = Field(..., example={"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05})
+    hydrogen_fraction: float = Field(0.0, ge=0.0, le=1.0, description="氢气的摩尔分数")
+    T_work: float = Field(..., gt=0, example=350.0, description="工况温度 (K)")
+    P_work_kPa: float = Field(..., example=10000.0, description="工况压力 (kPa)")
+    T_base: float = Field(293.15, gt=0, description="标况温度 (K)")
+    P_base_kPa: float = Field(101.325, description="标况压力 (kPa)")
+    Q_work: Union[float, List[float]] = Field(..., example=1000.0, description="工况流量 (m³/h)，可为数组")
+    solver: str = Field("bisection", example="newton", description="求解方法，同 /calculate")
+
+class FlowCalculationResponse(BaseModel):
+    final_components: Dict[str, float]
+    z_work: float
+    z_base: float
+    Q_base: Union[float, List[float]] = Field(..., description="标况流量 (Nm³/h)，与 Q_work 形式一致")
+
+class JobRequest(BaseModel):
+    """扫描任务: 在 T x P_kPa 网格上逐点计算 (单点即 1x1 网格)。"""
+    base_components: Dict[str, float] = Field(..., example={"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05})
+    hydrogen_fraction: float = Field(0.0, ge=0.0, le=1.0, description="氢气的摩尔分数")
+    T: Union[PositiveFloat, List[PositiveFloat]] = Field(..., example=[273.15, 293.15, 313.15], description="温度 (K)，可为数组")
+    P_kPa: Union[float, List[float]] = Field(..., example=[1000.0, 5000.0], description="压力 (kPa)，可为数组")
+    solver: str = Field("bisection", example="linear_scan",
+                        description="求解方法: /calculate 支持的方法，以及 linear_scan (线性扫描法)、batch (向量化)")
+    max_iterations: Optional[int] = Field(None, gt=0, description="最大迭代次数，缺省时使用求解器默认值")
+    tolerance: Optional[float] = Field(None, gt=0, description="压力收敛容差 (MPa)")
+    step: Optional[float] = Field(None, gt=0, description="线性扫描步长 (mol/L)，仅 linear_scan 有效")
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    messages: List[str] = []
+    result: Optional[dict] = None
+
+class BatchCalculationRequest(BaseModel):
+    """批量计算请求: 提供 items (逐条请求)，或提供一组组分加上等长的 T / P_kPa 数组，二者择一。"""
+    items: Optional[List[CalculationRequest]] = Field(None, description="逐条计算请求列表")
+    base_components: Optional[Dict[str, float]] = Field(None, example={"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05})
+    hydrogen_fraction: float = Field(0.0, ge=0.0, le=1.0, description="氢气的摩尔分数")
+    T: Optional[List[float]] = Field(None, example=[288.15, 293.15], description="温度数组 (K)")
+    P_kPa: Optional[List[float]] = Field(None, example=[1013.25, 101.325], description="压力数组 (kPa)")
+
+class BatchItemResult(BaseModel):
+    final_components: Optional[Dict[str, float]] = None
+    compression_factor: Optional[float] = None
+    error: Optional[str] = None
+
+class BatchCalculationResponse(BaseModel):
+    results: List[BatchItemResult]
+
+class MatrixCalculationRequest(BaseModel):
+    """
+    组分矩阵计算: 每个基础组分与每个氢气摩尔分数组合为一行 (共 len(compositions) x len(hydrogen_fractions) 行)，
+    每行在全部 (T[j], P_kPa[j]) 工况点上计算。
+    """
+    compositions: List[Dict[str, float]] = Field(..., example=[{"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05}])
+    hydrogen_fractions: List[float] = Field([0.0], example=[0.0, 0.1, 0.2], description="氢气的摩尔分数列表")
+    T: List[float] = Field(..., example=[288.15, 293.15], description="温度数组 (K)")
+    P_kPa: List[float] = Field(..., example=[1013.25, 5000.0], description="压力数组 (kPa)，与 T 等长")
+
+class MatrixCalculationResponse(BaseModel):
+    final_components: List[Dict[str, float]] = Field(..., description="各行调整后的组分 (按基础组分、氢气摩尔分数的顺序)")
+    compression_factor: List[List[Optional[float]]] = Field(..., description="compression_factor[i][j] 为第 i 行在第 j 个工况点的 Z，未收敛为 null")
+
+class HydrogenRange(BaseModel):
+    start: float = Field(0.0, ge=0.0, le=1.0)
+    stop: float = Field(..., ge=0.0, le=1.0, example=0.3, description="终值 (含)")
+    step: float = Field(..., gt=0.0, example=0.01)
+
+class HydrogenSweepRequest(BaseModel):
+    """掺氢扫描: 一个基础组分、一组氢气摩尔分数 (列表或范围，二者择一) 与一组 (T, P_kPa) 工况点的全组合。"""
+    base_components: Dict[str, float] = Field(..., example={"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05})
+    hydrogen_fractions: Optional[List[float]] = Field(None, example=[0.0, 0.1, 0.2], description="氢气的摩尔分数列表")
+    hydrogen_range: Optional[HydrogenRange] = Field(None, description="氢气摩尔分数范围 start:stop:step")
+    T: List[float] = Field(..., example=[288.15, 293.15], description="温度数组 (K)")
+    P_kPa: List[float] = Field(..., example=[1013.25, 5000.0], description="压力数组 (kPa)，与 T 等长")
+
+class HydrogenSweepResponse(BaseModel):
+    """按列返回的扫描结果: 各列等长，第 k 行为 (hydrogen_fraction[k], T[k], P_kPa[k]) 处的结果，按氢气摩尔分数优先排列。"""
+    hydrogen_fraction: List[float]
+    T: List[float]
+    P_kPa: List[float]
+    compression_factor: List[Optional[float]] = Field(..., description="未收敛为 null")
+    molar_density: List[Optional[float]] = Field(..., description="摩尔密度 (mol/L)")
+    mass_density: List[Optional[float]] = Field(..., description="质量密度 (kg/m³)")
+    molar_mass: List[float] = Field(..., description="混合物摩尔质量 (g/mol)")
 
 # --- 内部辅助函数 (采纳自 refer/main.py) ---
 
@@ -75,14 +235,74 @@ def adjust_compositions_with_hydrogen(base_components: Dict[str, float], hydroge
 
     return final_components
 
+def hydrogen_blend_weights(base_vector: np.ndarray, hydrogen_fractions: np.ndarray):
+    """
+    把 adjust_compositions_with_hydrogen + components_to_vector 得到的组分写成 alpha*c + beta*e_H2，
+    其中 c 为去掉氢气后的 (已归一化) 基础组分，e_H2 为纯氢。返回 (c, e_H2, alpha, beta)。
+    与 adjust_compositions_with_hydrogen 一致: h > 0 时基础组分中原有的氢气被 h 取代后再归一化，h = 0 时保留。
+    """
+    h2 = INTERNAL_NAME_TO_INDEX_MAP["H2"]
+    c = base_vector.copy()
+    c[h2] = 0.0
+    e_h2 = np.zeros(N)
+    e_h2[h2] = 1.0
+    h = np.asarray(hydrogen_fractions, dtype=float)
+    total = (1 - h) * (1 - base_vector[h2]) + h
+    alpha = np.where(h > 0, (1 - h) / total, 1.0)
+    beta = np.where(h > 0, h / total, base_vector[h2])
+    return c, e_h2, alpha, beta
+
+def components_to_vector(final_components: Dict[str, float]) -> np.ndarray:
+    """将以API标准名称为键的组分字典转换为内部计算函数所需的21元Numpy数组。"""
+    x = np.zeros(N)
+    for api_name, fraction in final_components.items():
+        internal_name = API_TO_INTERNAL_NAME_MAP.get(api_name)
+        if internal_name is None:
+            raise ValueError(f"不支持的组分名称: '{api_name}'")
+
+        index = INTERNAL_NAME_TO_INDEX_MAP.get(internal_name)
+        if index is None:
+            raise KeyError(f"内部错误: 组分'{internal_name}'在顺序列表中未找到。")
+
+        x[index] = fraction
+
+    # 确保数组总和为1 (防止浮点误差)
+    if abs(np.sum(x) - 1.0) > 1e-9:
+        x /= np.sum(x)
+    return x
+
+def make_cache_key(final_components: Dict[str, float], T: float, P_kPa: float, solver: str):
+    """
+    由调整后的组分、温度、压力和求解方法构造缓存键 (纯Python实现，命中时无需调用Numpy)。
+    组分按21元内部顺序排列并归一化后量化；含不支持组分时返回 None (不缓存)。
+    """
+    slots = [0.0] * N
+    for api_name, fraction in final_components.items():
+        index = INTERNAL_NAME_TO_INDEX_MAP.get(API_TO_INTERNAL_NAME_MAP.get(api_name))
+        if index is None:
+            return None
+        slots[index] = fraction
+    total = sum(slots)
+    if total <= 0:
+        return None
+    composition = tuple(round(v / total / CACHE_X_RESOLUTION) for v in slots)
+    return (composition, round(T / CACHE_T_RESOLUTION), round(P_kPa / CACHE_P_RESOLUTION), solver)
+
 # --- API 端点定义 ---
 
-@app.post("/calculate", response_model=CalculationResponse)
-def calculate(request: CalculationRequest):
+@app.post("/calculate", response_model=CalculationResponse, response_model_exclude_none=True)
+async def calculate(request: CalculationRequest):
     """
     计算给定组分、温度和压力下的气体压缩因子。
     该接口在内部将API格式的输入转换为本地AGA8计算引擎所需的格式。
     """
+    solver_func = SOLVERS.get(request.solver)
+    if solver_func is None:
+        raise HTTPException(status_code=400, detail=f"不支持的求解方法: '{request.solver}'，可选: {list(SOLVERS)}")
+    if request.properties and request.solver == "table":
+        # 查表得到的是插值密度，在其处求得的导数并不对应收敛解
+        raise HTTPException(status_code=400, detail="查表法 (table) 不提供导出性质，请改用迭代求解方法。")
+
     # 1. (采纳自refer) 根据氢气含量，调整并归一化组分
     try:
         final_components_api_names = adjust_compositions_with_hydrogen(
@@ -91,34 +311,438 @@ def calculate(request: CalculationRequest):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    # 查询结果缓存 (缓存中只有 Z，请求导出性质时不使用)
+    cache_key = make_cache_key(final_components_api_names, request.T, request.P_kPa, request.solver)
+    if cache_key is not None and not request.properties:
+        cached_Z = RESULT_CACHE.get(cache_key)
+        if cached_Z is not None:
+            return CalculationResponse(
+                final_components=final_components_api_names,
+                compression_factor=cached_Z,
+            )
+
     # 2. (适配器核心) 将API格式输入转换为内部计算函数所需的21元Numpy数组
-    x = np.zeros(N)
-    for api_name, fraction in final_components_api_names.items():
-        internal_name = API_TO_INTERNAL_NAME_MAP.get(api_name)
-        if internal_name is None:
-            raise HTTPException(status_code=400, detail=f"不支持的组分名称: '{api_name}'")
-        
-        index = INTERNAL_NAME_TO_INDEX_MAP.get(internal_name)
-        if index is None:
-             raise HTTPException(status_code=500, detail=f"内部错误: 组分'{internal_name}'在顺序列表中未找到。")
-        
-        x[index] = fraction
-    
-    # 确保数组总和为1 (防止浮点误差)
-    if abs(np.sum(x) - 1.0) > 1e-9:
-         x /= np.sum(x)
+    try:
+        x = components_to_vector(final_components_api_names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=500, detail=e.args[0])
 
     # 3. (适配器核心) 压力单位转换 (kPa -> MPa)
     pressure_mpa = request.P_kPa / 1000.0
 
     # 4. (核心调用) 调用内部核心计算函数
+    # 导出性质只需在收敛密度处再计算一次压力方程及其解析导数，与求解一起在执行池中完成
     try:
-        Z, _, _, _, _ = calculate_z_factor_bisection(T=request.T, P0=pressure_mpa, x=x)
+        if request.properties:
+            result = await SOLVER_POOL.run(solve_with_properties, solver_func, T=request.T, P0=pressure_mpa, x=x)
+        else:
+            result = await SOLVER_POOL.run(solver_func, T=request.T, P0=pressure_mpa, x=x)
+        Z, *_ = result
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        # 输入状态无法可靠求解 (如压力非单调、区间内无根)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"核心计算模块发生错误: {e}")
 
+    if cache_key is not None:
+        RESULT_CACHE.put(cache_key, float(Z))
+
+    properties = result.as_dict() if request.properties else None
+
     # 5. (采纳自refer) 准备并返回响应
     return CalculationResponse(
         final_components=final_components_api_names,
         compression_factor=Z,
-    )
\ No newline at end of file
+        properties=properties,
+    )
+
+@app.post("/calculate/flow", response_model=FlowCalculationResponse)
+async def calculate_flow(request: FlowCalculationRequest):
+    """
+    一次请求同时求解工况与标况压缩因子并换算标况流量。
+    两次求解共用同一组分的预处理结果；两个 Z 都在结果缓存中时不调用求解器。
+    """
+    solver_func = SOLVERS.get(request.solver)
+    if solver_func is None:
+        raise HTTPException(status_code=400, detail=f"不支持的求解方法: '{request.solver}'，可选: {list(SOLVERS)}")
+    if request.P_base_kPa <= 0:
+        raise HTTPException(status_code=400, detail="标况压力必须为正数。")
+
+    try:
+        final_components_api_names = adjust_compositions_with_hydrogen(
+            request.base_components, request.hydrogen_fraction
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    Q_work = np.asarray(request.Q_work, dtype=float)
+    P_work, P_base = request.P_work_kPa / 1000.0, request.P_base_kPa / 1000.0
+    key_work = make_cache_key(final_components_api_names, request.T_work, request.P_work_kPa, request.solver)
+    key_base = make_cache_key(final_components_api_names, request.T_base, request.P_base_kPa, request.solver)
+    Z_work = RESULT_CACHE.get(key_work) if key_work is not None else None
+    Z_base = RESULT_CACHE.get(key_base) if key_base is not None else None
+
+    if Z_work is not None and Z_base is not None:
+        Q_base = standard_flow(Q_work, request.T_work, P_work, request.T_base, P_base, Z_work, Z_base)
+    else:
+        try:
+            x = components_to_vector(final_components_api_names)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except KeyError as e:
+            raise HTTPException(status_code=500, detail=e.args[0])
+
+        try:
+            Q_base, Z_work, Z_base = await SOLVER_POOL.run(
+                convert_to_standard_flow, Q_work, request.T_work, P_work, x,
+                T_base=request.T_base, P_base=P_base, solver=solver_func,
+            )
+        except PoolSaturated as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"核心计算模块发生错误: {e}")
+
+        if key_work is not None:
+            RESULT_CACHE.put(key_work, Z_work)
+        if key_base is not None:
+            RESULT_CACHE.put(key_base, Z_base)
+
+    return FlowCalculationResponse(
+        final_components=final_components_api_names,
+        z_work=Z_work,
+        z_base=Z_base,
+        Q_base=np.asarray(Q_base).tolist(),
+    )
+
+@app.post("/calculate/batch", response_model=BatchCalculationResponse)
+async def calculate_batch(request: BatchCalculationRequest):
+    """
+    批量计算压缩因子，结果按输入顺序返回。
+    所有有效的点一次性交给向量化求解器 (calculate_z_factor_batch)；
+    单个点的输入或计算错误记录在该点的 error 字段中，不影响其余点。
+    批量接口统一使用向量化牛顿法，items 中的 solver 字段不生效。
+    """
+    if request.items is not None:
+        if request.base_components is not None or request.T is not None or request.P_kPa is not None:
+            raise HTTPException(status_code=400, detail="items 与 base_components/T/P_kPa 只能二选一。")
+        points = [(item.base_components, item.hydrogen_fraction, item.T, item.P_kPa) for item in request.items]
+    else:
+        if request.base_components is None or request.T is None or request.P_kPa is None:
+            raise HTTPException(status_code=400, detail="必须提供 items，或同时提供 base_components、T 和 P_kPa。")
+        if len(request.T) != len(request.P_kPa):
+            raise HTTPException(status_code=400, detail=f"T ({len(request.T)}) 与 P_kPa ({len(request.P_kPa)}) 的长度必须一致。")
+        points = [(request.base_components, request.hydrogen_fraction, T, P_kPa)
+                  for T, P_kPa in zip(request.T, request.P_kPa)]
+
+    results = [BatchItemResult() for _ in points]
+
+    # 1. 逐点整理组分 (相同组分只转换一次)，收集有效点
+    composition_cache = {}
+    valid, x_rows, T_values, P_values = [], [], [], []
+    for i, (base_components, hydrogen_fraction, T, P_kPa) in enumerate(points):
+        key = (tuple(sorted(base_components.items())), hydrogen_fraction)
+        try:
+            if key not in composition_cache:
+                final_components = adjust_compositions_with_hydrogen(base_components, hydrogen_fraction)
+                composition_cache[key] = (final_components, components_to_vector(final_components))
+            final_components, x = composition_cache[key]
+        except (ValueError, KeyError) as e:
+            results[i].error = e.args[0]
+            continue
+        results[i].final_components = final_components
+        valid.append(i)
+        x_rows.append(x)
+        T_values.append(T)
+        P_values.append(P_kPa / 1000.0)
+
+    if not valid:
+        return BatchCalculationResponse(results=results)
+
+    # 2. 向量化求解
+    max_iterations = 100
+    try:
+        Z, _, _, _, iters = await SOLVER_POOL.run(calculate_z_factor_batch, np.array(T_values), np.array(P_values),
+                                                  np.array(x_rows), max_iterations=max_iterations)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"核心计算模块发生错误: {e}")
+
+    for j, i in enumerate(valid):
+        if not np.isfinite(Z[j]) or iters[j] >= max_iterations:
+            results[i].error = "密度迭代未收敛"
+        else:
+            results[i].compression_factor = float(Z[j])
+
+    return BatchCalculationResponse(results=results)
+
+@app.post("/calculate/matrix", response_model=MatrixCalculationResponse)
+async def calculate_matrix(request: MatrixCalculationRequest):
+    """
+    对多个组分 (基础组分 x 氢气摩尔分数) 在同一组工况点上计算压缩因子。
+    全部组分的混合物参数以矩阵形式一次算出，所有点的密度在同一次向量化牛顿迭代中求解 (calculate_z_factor_matrix)。
+    """
+    if len(request.T) != len(request.P_kPa):
+        raise HTTPException(status_code=400, detail=f"T ({len(request.T)}) 与 P_kPa ({len(request.P_kPa)}) 的长度必须一致。")
+    n_rows = len(request.compositions) * len(request.hydrogen_fractions)
+    if n_rows * len(request.T) > MATRIX_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"计算点数 {n_rows * len(request.T)} 超过上限 {MATRIX_MAX_POINTS}。")
+    if n_rows == 0 or not request.T:
+        return MatrixCalculationResponse(final_components=[], compression_factor=[[] for _ in range(n_rows)])
+
+    final_components, x_rows = [], []
+    for i, base_components in enumerate(request.compositions):
+        for hydrogen_fraction in request.hydrogen_fractions:
+            try:
+                components = adjust_compositions_with_hydrogen(base_components, hydrogen_fraction)
+                x_rows.append(components_to_vector(components))
+            except (ValueError, KeyError) as e:
+                raise HTTPException(status_code=400, detail=f"第 {i} 个组分 (氢气 {hydrogen_fraction}): {e.args[0]}")
+            final_components.append(components)
+
+    max_iterations = 100
+    try:
+        Z, _, _, _, iters = await SOLVER_POOL.run(calculate_z_factor_matrix, np.array(request.T),
+                                                  np.array(request.P_kPa) / 1000.0, np.array(x_rows),
+                                                  max_iterations=max_iterations)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"核心计算模块发生错误: {e}")
+
+    converged = np.isfinite(Z) & (iters < max_iterations)
+    compression_factor = np.where(converged, Z, np.nan).tolist()
+    compression_factor = [[None if z != z else z for z in row] for row in compression_factor]
+    return MatrixCalculationResponse(final_components=final_components, compression_factor=compression_factor)
+
+@app.post("/sweep/hydrogen", response_model=HydrogenSweepResponse)
+async def sweep_hydrogen(request: HydrogenSweepRequest):
+    """
+    掺氢扫描: 一个基础组分在多个氢气摩尔分数、多个工况点上的压缩因子与密度。
+    混合物参数对组分是二次型，基础气-基础气、基础气-氢、氢-氢三组和只计算一次，
+    各掺氢比例的参数只是它们的加权组合 (calculate_z_factor_blend)；所有点在一次向量化求解中完成。
+    结果按列返回，便于前端直接绘图。
+    """
+    if (request.hydrogen_fractions is None) == (request.hydrogen_range is None):
+        raise HTTPException(status_code=400, detail="hydrogen_fractions 与 hydrogen_range 必须且只能提供一个。")
+    if len(request.T) != len(request.P_kPa):
+        raise HTTPException(status_code=400, detail=f"T ({len(request.T)}) 与 P_kPa ({len(request.P_kPa)}) 的长度必须一致。")
+    if request.hydrogen_range is not None:
+        r = request.hydrogen_range
+        if r.stop < r.start:
+            raise HTTPException(status_code=400, detail="hydrogen_range 的 stop 不能小于 start。")
+        count = int(np.floor((r.stop - r.start) / r.step + 1e-9)) + 1
+        if count * len(request.T) > MATRIX_MAX_POINTS:
+            raise HTTPException(status_code=400, detail=f"计算点数 {count * len(request.T)} 超过上限 {MATRIX_MAX_POINTS}。")
+        fractions = r.start + r.step * np.arange(count)
+    else:
+        fractions = np.array(request.hydrogen_fractions, dtype=float)
+        if np.any((fractions < 0) | (fractions > 1)):
+            raise HTTPException(status_code=400, detail="氢气摩尔分数必须在 0.0 和 1.0 之间。")
+    n_points = fractions.size * len(request.T)
+    if n_points > MATRIX_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"计算点数 {n_points} 超过上限 {MATRIX_MAX_POINTS}。")
+
+    try:
+        base_vector = components_to_vector(adjust_compositions_with_hydrogen(request.base_components, 0.0))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=500, detail=e.args[0])
+    c, e_h2, alpha, beta = hydrogen_blend_weights(base_vector, fractions)
+
+    T = np.array(request.T, dtype=float)
+    P_kPa = np.array(request.P_kPa, dtype=float)
+    max_iterations = 100
+    if n_points == 0:
+        Z = pm = p_density = iters = np.zeros((fractions.size, T.size))
+    else:
+        try:
+            Z, pm, _, p_density, iters = await SOLVER_POOL.run(calculate_z_factor_blend, T, P_kPa / 1000.0,
+                                                               c, e_h2, alpha, beta, max_iterations=max_iterations)
+        except PoolSaturated as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"核心计算模块发生错误: {e}")
+
+    converged = (np.isfinite(Z) & (iters < max_iterations)).ravel()
+
+    def column(values):
+        return [v if ok else None for v, ok in zip(np.asarray(values).ravel().tolist(), converged)]
+
+    molar_mass = alpha * (c @ M) + beta * M[INTERNAL_NAME_TO_INDEX_MAP["H2"]]
+    return HydrogenSweepResponse(
+        hydrogen_fraction=np.repeat(fractions, T.size).tolist(),
+        T=np.tile(T, fractions.size).tolist(),
+        P_kPa=np.tile(P_kPa, fractions.size).tolist(),
+        compression_factor=column(Z),
+        molar_density=column(pm),
+        mass_density=column(p_density),
+        molar_mass=np.repeat(molar_mass, T.size).tolist(),
+    )
+
+
+# --- 后台任务 ---
+
+def _run_sweep_job(job, x, T_values, P_values_kPa, solver, solver_options):
+    """
+    在线程中执行扫描任务，结果按列返回: Z[i][j] 对应 T[i]、P_kPa[j]，无法求解的点为 None 并记入 errors。
+    batch 求解器按行分块向量化计算；其余求解器逐点计算。进度按已完成的点数报告，
+    线性扫描法在单点内部也通过 JobTracer 检查取消请求。
+    """
+    n_T, n_P = len(T_values), len(P_values_kPa)
+    total = n_T * n_P
+    Z = [[None] * n_P for _ in range(n_T)]
+    errors = []
+    solver_func = JOB_SOLVERS[solver]
+
+    if solver == "batch":
+        P_mpa = np.array(P_values_kPa) / 1000.0
+        max_iterations = solver_options.get("max_iterations", 100)
+        for i, T in enumerate(T_values):
+            job.check_cancelled()
+            Z_row, _, _, _, iters = solver_func(np.full(n_P, T), P_mpa, x, **solver_options)
+            for j in range(n_P):
+                if np.isfinite(Z_row[j]) and iters[j] < max_iterations:
+                    Z[i][j] = float(Z_row[j])
+                else:
+                    errors.append({"T": T, "P_kPa": P_values_kPa[j], "error": "密度迭代未收敛"})
+            job.set_progress((i + 1) / n_T)
+    else:
+        tracer = JobTracer(job, level=TRACE_ITERATIONS if solver == "linear_scan" else TRACE_OFF)
+        for i, T in enumerate(T_values):
+            for j, P_kPa in enumerate(P_values_kPa):
+                k = i * n_P + j
+                try:
+                    Z[i][j] = float(solver_func(T, P_kPa / 1000.0, x, tracer=tracer, **solver_options)[0])
+                except ValueError as e:
+                    errors.append({"T": T, "P_kPa": P_kPa, "error": str(e)})
+                job.set_progress((k + 1) / total)
+
+    job.add_message(f"扫描完成: 共 {total} 个点，失败 {len(errors)} 个。\n")
+    return {"T": T_values, "P_kPa": P_values_kPa, "Z": Z, "errors": errors}
+
+
+def _get_job_or_404(job_id: str):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在或已过期。")
+    return job
+
+
+@app.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    """提交扫描任务，立即返回任务状态；之后通过 GET /jobs/{id} 或 /jobs/{id}/events 获取进度与结果。"""
+    if request.solver not in JOB_SOLVERS:
+        raise HTTPException(status_code=400, detail=f"不支持的求解方法: '{request.solver}'，可选: {list(JOB_SOLVERS)}")
+    T_values = request.T if isinstance(request.T, list) else [request.T]
+    P_values = request.P_kPa if isinstance(request.P_kPa, list) else [request.P_kPa]
+    if not T_values or not P_values:
+        raise HTTPException(status_code=400, detail="T 与 P_kPa 不能为空。")
+    if len(T_values) * len(P_values) > JOB_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"网格点数超过上限 {JOB_MAX_POINTS}。")
+
+    try:
+        final_components = adjust_compositions_with_hydrogen(request.base_components, request.hydrogen_fraction)
+        x = components_to_vector(final_components)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=500, detail=e.args[0])
+
+    solver_options = {}
+    if request.max_iterations is not None:
+        solver_options["max_iterations"] = request.max_iterations
+    if request.tolerance is not None:
+        solver_options["tolerance"] = request.tolerance
+    if request.step is not None:
+        if request.solver != "linear_scan":
+            raise HTTPException(status_code=400, detail="step 仅适用于 linear_scan。")
+        solver_options["step"] = request.step
+
+    params = {"final_components": final_components, "solver": request.solver,
+              "points": len(T_values) * len(P_values)}
+    try:
+        job = JOB_MANAGER.submit("sweep", params, _run_sweep_job, x, T_values, P_values,
+                                 request.solver, solver_options)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return job.snapshot()
+
+
+@app.get("/jobs", response_model=List[JobStatusResponse])
+def list_jobs():
+    """列出保留中的任务 (不含结果)。"""
+    return [job.snapshot(include_result=False) for job in JOB_MANAGER.list()]
+
+
+@app.get("/jobs/stats")
+def job_stats():
+    """返回任务队列配置及各状态的任务数。"""
+    return JOB_MANAGER.stats()
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str):
+    """查询任务状态；任务成功完成后 result 中包含计算结果。"""
+    return _get_job_or_404(job_id).snapshot()
+
+
+@app.delete("/jobs/{job_id}", response_model=JobStatusResponse)
+def cancel_job(job_id: str):
+    """取消排队中或运行中的任务 (运行中的任务在下一次报告进度时停止)。"""
+    job = _get_job_or_404(job_id)
+    JOB_MANAGER.cancel(job_id)
+    return job.snapshot(include_result=False)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    以 Server-Sent Events 推送任务进度: 状态变化时发送 progress 事件，任务结束时发送 done 事件 (含结果) 后关闭。
+    空闲时每 15 秒发送一次注释行保持连接。
+    """
+    job = _get_job_or_404(job_id)
+
+    async def events():
+        version = -1
+        while True:
+            new_version = await job.wait_for_change(version, timeout=15)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            finished = job.finished
+            data = json.dumps(job.snapshot(include_result=finished), ensure_ascii=False)
+            yield f"event: {'done' if finished else 'progress'}\ndata: {data}\n\n"
+            if finished:
+                return
+            await asyncio.sleep(0.1)  # 合并短时间内的多次进度更新
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """返回结果缓存的容量、命中/未命中次数等统计信息。"""
+    return RESULT_CACHE.stats()
+
+
+@app.delete("/cache")
+def cache_clear():
+    """清空结果缓存并重置统计计数。"""
+    RESULT_CACHE.clear()
+    return RESULT_CACHE.stats()
+
+
+@app.get("/pool/stats")
+def pool_stats():
+    """返回求解器执行池的工作进程数、排队任务数及拒绝次数。"""
+    return SOLVER_POOL.stats()
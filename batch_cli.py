@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+历史数据批量计算命令行工具。
+按固定行数分块流式读取 CSV (安装 pyarrow 时也支持 Parquet) 中的温度、压力及组分，
+逐块交给向量化求解器 calculate_z_factor_batch，并将 Z、摩尔密度、质量密度和收敛标志写入输出文件。
+内存占用只与分块大小和并行块数有关，与文件总行数无关。
+
+组分可以用 21 个组分列给出 (列名见 COMPONENT_COLUMNS，缺少的列和空单元格按 0 处理，每行自动归一化；
+含负值或无法解析的值、或合计为 0 的行视为无效)，
+也可以用组分 ID 列配合 JSON 组分表给出: {"站场A": {"CH4": 0.96, "N2": 0.01, ...}, ...}。
+
+示例:
+    python batch_cli.py history.csv result.csv --pressure-unit kPa --workers 4
+    python batch_cli.py history.parquet result.parquet --composition-id-column gas_id --compositions gas.json
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+from constants import N
+from calculator_batch import calculate_z_factor_batch
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+# 组分列名，顺序与 constants.py 中的组分顺序一致
+COMPONENT_COLUMNS = ["CH4", "N2", "CO2", "C2H6", "C3H8", "H2O", "H2S", "H2", "CO", "O2",
+                     "i-C4H10", "n-C4H10", "i-C5H12", "n-C5H12", "n-C6H14", "n-C7H16",
+                     "n-C8H18", "n-C9H20", "n-C10H22", "He", "Ar"]
+
+# 压力单位换算到 MPa
+PRESSURE_UNITS = {"MPa": 1.0, "kPa": 1e-3, "bar": 0.1, "Pa": 1e-6}
+
+def _to_float(values):
+    """将一列值转换为浮点数组，无法解析的值 (如空字符串) 记为 NaN。"""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        result = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except (TypeError, ValueError):
+                result[i] = np.nan
+        return result
+
+
+def _is_blank(value):
+    """空单元格: None、空白字符串或数值型 NaN (Parquet 的空值)。文本 "nan" 不算空单元格。"""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    return isinstance(value, (float, np.floating)) and np.isnan(value)
+
+
+def _component_column(values):
+    """
+    将一个组分列转换为浮点数组: 空单元格 (见 _is_blank) 记为 0，
+    其余无法解析的值 (包括文本 "nan") 记为 NaN (使该行无效)。
+    整列可直接转换与需要逐个解析时对同一单元格的判断相同。
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+        # Parquet 数值列: NaN 都来自空值
+        return np.where(np.isnan(values), 0.0, values)
+    try:
+        result = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        result = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except (TypeError, ValueError):
+                result[i] = np.nan
+    for i in np.flatnonzero(np.isnan(result)).tolist():
+        if _is_blank(values[i]):
+            result[i] = 0.0
+    return result
+
+
+def _composition_matrix(columns, n_rows, options):
+    """
+    由组分列或组分 ID 列构建 (n_rows, 21) 的组分矩阵。
+    未知 ID、含负值或无法解析的值、以及组分合计为 0 的行为 NaN。
+    """
+    id_column = options["composition_id_column"]
+    if id_column is not None:
+        table = options["composition_table"]
+        x = np.full((n_rows, N), np.nan)
+        ids = [str(value) for value in columns[id_column]]
+        for gas_id in set(ids):
+            if gas_id in table:
+                rows = [i for i, value in enumerate(ids) if value == gas_id]
+                x[rows] = table[gas_id]
+        return x
+
+    x = np.zeros((n_rows, N))
+    for idx, name in enumerate(COMPONENT_COLUMNS):
+        if name in columns:
+            x[:, idx] = _component_column(columns[name])
+    total = x.sum(axis=1)
+    invalid = ~(total > 0) | np.any(x < 0, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x /= total[:, None]
+    x[invalid] = np.nan
+    return x
+
+
+def solve_chunk(columns, options):
+    """
+    计算一个数据块。columns 为 {列名: 值序列}，返回 {列名: 数组} 形式的输出块。
+    温度/压力/组分无效的行不参与求解，Z 等记为 NaN，converged 为 0。
+    """
+    T = _to_float(columns[options["temperature_column"]])
+    P0 = _to_float(columns[options["pressure_column"]]) * PRESSURE_UNITS[options["pressure_unit"]]
+    n_rows = T.size
+    x = _composition_matrix(columns, n_rows, options)
+
+    valid = np.isfinite(T) & (T > 0) & np.isfinite(P0) & (P0 > 0) & np.all(np.isfinite(x), axis=1)
+    Z = np.full(n_rows, np.nan)
+    pm = np.full(n_rows, np.nan)
+    mass_density = np.full(n_rows, np.nan)
+    iterations = np.zeros(n_rows, dtype=np.int64)
+    if valid.any():
+        max_iterations = options["max_iterations"]
+        Z_v, pm_v, _, rho_v, iters_v = calculate_z_factor_batch(T[valid], P0[valid], x[valid],
+                                                                max_iterations=max_iterations,
+                                                                tolerance=options["tolerance"])
+        Z[valid], pm[valid], mass_density[valid], iterations[valid] = Z_v, pm_v, rho_v, iters_v
+    converged = valid & np.isfinite(Z) & (iterations < options["max_iterations"])
+
+    output = {}
+    for name in options["passthrough_columns"]:
+        output[name] = list(columns[name])
+    output.update({
+        options["temperature_column"]: T,
+        options["pressure_column"]: _to_float(columns[options["pressure_column"]]),
+        "Z": Z,
+        "molar_density": pm,        # mol/L
+        "mass_density": mass_density,  # kg/m3
+        "iterations": iterations,
+        "converged": converged.astype(np.int8),
+    })
+    return output
+
+
+# --- 输入 ---
+
+def _iter_csv_chunks(path, chunk_size):
+    """
+    CSV 按原始文本行分块，解析放在 decode_chunk 中 (并行时在工作进程内完成)。
+    因此不支持字段内含换行符的 CSV。
+    """
+    with open(path, newline="", encoding="utf-8-sig") as fp:
+        header = next(csv.reader([fp.readline()]))
+        while True:
+            lines = list(islice(fp, chunk_size))
+            if not lines:
+                return
+            yield header, lines
+
+
+def decode_chunk(raw):
+    """将 iter_chunks 产生的原始块转换为 {列名: 值序列}。"""
+    if isinstance(raw, dict):
+        return raw
+    header, lines = raw
+    rows = [row for row in csv.reader(lines) if row]
+    return {name: [row[i] if i < len(row) else "" for row in rows] for i, name in enumerate(header)}
+
+
+def _iter_parquet_chunks(path, chunk_size):
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield {name: batch.column(i).to_numpy(zero_copy_only=False) for i, name in enumerate(batch.schema.names)}
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def iter_chunks(path, chunk_size):
+    """按 chunk_size 行分块读取输入文件，逐块产生原始块 (用 decode_chunk 转换为 {列名: 值序列})。"""
+    if _is_parquet(path):
+        if pyarrow is None:
+            raise RuntimeError("读取 Parquet 文件需要安装 pyarrow。")
+        return _iter_parquet_chunks(path, chunk_size)
+    return _iter_csv_chunks(path, chunk_size)
+
+
+# --- 输出 ---
+
+def _format_column(values):
+    """将一列输出值整体转换为字符串列表，NaN 写为空字符串。"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fiu":
+        text = values.astype(str)
+        if values.dtype.kind == "f":
+            text[np.isnan(values)] = ""
+        return text.tolist()
+    return values
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self._fp = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._fp)
+        self._header = None
+
+    def write(self, chunk):
+        if self._header is None:
+            self._header = list(chunk)
+            self._writer.writerow(self._header)
+        self._writer.writerows(zip(*(_format_column(chunk[name]) for name in self._header)))
+
+    def close(self):
+        self._fp.close()
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        if pyarrow is None:
+            raise RuntimeError("写入 Parquet 文件需要安装 pyarrow。")
+        self._path = path
+        self._writer = None
+
+    def write(self, chunk):
+        table = pyarrow.table({name: pyarrow.array(values) for name, values in chunk.items()})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_sink(path):
+    return _ParquetSink(path) if _is_parquet(path) else _CsvSink(path)
+
+
+def _process_chunk(raw, options, text_output):
+    """
+    解析并计算一个原始块，返回 (输出块, 行数, 收敛行数)。
+    text_output 为真时在此处把输出列格式化为字符串，使 CSV 的格式化开销也分摊到工作进程。
+    """
+    chunk = solve_chunk(decode_chunk(raw), options)
+    n_rows, n_converged = len(chunk["Z"]), int(chunk["converged"].sum())
+    if text_output:
+        chunk = {name: _format_column(values) for name, values in chunk.items()}
+    return chunk, n_rows, n_converged
+
+
+# --- 主流程 ---
+
+def run(input_path, output_path, options, chunk_size=50000, workers=0, progress=None):
+    """
+    分块处理整个文件，返回统计信息 {"rows", "converged", "seconds", "rows_per_s"}。
+    workers > 0 时各块分发到进程池并行计算，同时在途的块数不超过 2*workers，输出保持输入顺序。
+    progress(rows, seconds) 在每块写出后调用。
+    """
+    start = time.perf_counter()
+    rows = 0
+    converged = 0
+    sink = open_sink(output_path)
+
+    text_output = isinstance(sink, _CsvSink)
+
+    def handle(result):
+        nonlocal rows, converged
+        chunk, n_rows, n_converged = result
+        sink.write(chunk)
+        rows += n_rows
+        converged += n_converged
+        if progress is not None:
+            progress(rows, time.perf_counter() - start)
+
+    try:
+        chunks = iter_chunks(input_path, chunk_size)
+        if workers > 0:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                in_flight = deque()
+                for raw in chunks:
+                    in_flight.append(executor.submit(_process_chunk, raw, options, text_output))
+                    if len(in_flight) >= 2 * workers:
+                        handle(in_flight.popleft().result())
+                while in_flight:
+                    handle(in_flight.popleft().result())
+        else:
+            for raw in chunks:
+                handle(_process_chunk(raw, options, text_output))
+    finally:
+        sink.close()
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "converged": converged, "seconds": seconds,
+            "rows_per_s": rows / seconds if seconds > 0 else 0.0}
+
+
+def _load_composition_table(path):
+    """读取 JSON 组分表，每个组分按 COMPONENT_COLUMNS 转换为归一化的 21 元向量。"""
+    with open(path, encoding="utf-8") as fp:
+        raw = json.load(fp)
+    table = {}
+    for gas_id, components in raw.items():
+        x = np.zeros(N)
+        for name, fraction in components.items():
+            if name not in COMPONENT_COLUMNS:
+                raise ValueError(f"组分表 {gas_id} 中包含不支持的组分: '{name}'")
+            x[COMPONENT_COLUMNS.index(name)] = fraction
+        if x.sum() <= 0:
+            raise ValueError(f"组分表 {gas_id} 的摩尔分数总和必须大于 0。")
+        table[str(gas_id)] = x / x.sum()
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AGA8-92DC 压缩因子批量计算 (CSV/Parquet 流式处理)")
+    parser.add_argument("input", help="输入文件 (.csv 或 .parquet)")
+    parser.add_argument("output", help="输出文件 (.csv 或 .parquet)")
+    parser.add_argument("--temperature-column", default="T", help="温度列名 (K)，默认 T")
+    parser.add_argument("--pressure-column", default="P", help="压力列名，默认 P")
+    parser.add_argument("--pressure-unit", default="MPa", choices=list(PRESSURE_UNITS))
+    parser.add_argument("--timestamp-column", default="timestamp", help="原样输出的时间戳列 (不存在时忽略)")
+    parser.add_argument("--composition-id-column", help="组分 ID 列名，需同时给出 --compositions")
+    parser.add_argument("--compositions", help="组分表 JSON 文件: {ID: {组分名: 摩尔分数}}")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="每块行数，默认 50000")
+    parser.add_argument("--workers", type=int, default=0, help="并行进程数，0 表示在当前进程中计算")
+    parser.add_argument("--max-iterations", type=int, default=100)
+    parser.add_argument("--tolerance", type=float, default=0.00001, help="压力收敛容差 (MPa)")
+    args = parser.parse_args(argv)
+
+    if (args.composition_id_column is None) != (args.compositions is None):
+        parser.error("--composition-id-column 与 --compositions 必须同时给出。")
+
+    options = {
+        "temperature_column": args.temperature_column,
+        "pressure_column": args.pressure_column,
+        "pressure_unit": args.pressure_unit,
+        "composition_id_column": args.composition_id_column,
+        "composition_table": _load_composition_table(args.compositions) if args.compositions else None,
+        "max_iterations": args.max_iterations,
+        "tolerance": args.tolerance,
+        "passthrough_columns": [],
+    }
+
+    # 由第一块确定列结构
+    first = next(iter(iter_chunks(args.input, 1)), None)
+    first = decode_chunk(first) if first is not None else None
+    if first is None:
+        parser.error(f"输入文件 {args.input} 中没有数据。")
+    for name in (args.temperature_column, args.pressure_column, args.composition_id_column):
+        if name is not None and name not in first:
+            parser.error(f"输入文件中缺少列 '{name}'。")
+    if args.composition_id_column is None and not any(name in first for name in COMPONENT_COLUMNS):
+        parser.error(f"输入文件中没有组分列 (应为 {', '.join(COMPONENT_COLUMNS)} 中的若干列)，"
+                     f"也未指定 --composition-id-column。")
+    passthrough = [args.timestamp_column] if args.timestamp_column in first else []
+    if args.composition_id_column is not None:
+        passthrough.append(args.composition_id_column)
+    options["passthrough_columns"] = passthrough
+
+    def progress(rows, seconds):
+        print(f"已处理 {rows} 行，{rows / seconds:.0f} 行/秒", file=sys.stderr)
+
+    stats = run(args.input, args.output, options, chunk_size=args.chunk_size, workers=args.workers,
+                progress=progress)
+    failed = stats["rows"] - stats["converged"]
+    print(f"完成: 共 {stats['rows']} 行，未收敛或无效 {failed} 行，耗时 {stats['seconds']:.2f} 秒 "
+          f"({stats['rows_per_s']:.0f} 行/秒)，结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
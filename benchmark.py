@@ -1,77 +1,253 @@
+import argparse
+import json
+import platform
+import subprocess
 import time
+from datetime import datetime, timezone
+
 import numpy as np
-from calculator import calculate_z_factor
-from calculator_pure import calculate_z_factor_pure
+from calculator import calculate_z_factor_bisection, calculate_z_factor_newton
+from calculator_batch import calculate_z_factor_batch
+from calculator_numba import calculate_z_factor_numba, warmup as numba_warmup
+from calculator_pure import calculate_z_factor_linear_scan
 from calculator_optimized import calculate_z_factor_optimized
+from tracing import EvaluationCounter
+
+# --- 测试组分 (21元内部顺序) ---
+COMPOSITIONS = {
+    # 贫气: gui.py 的默认组分
+    "lean": [0.961651, 0.008606, 0.004567, 0.01998, 0.003859, 0, 0, 0, 0, 0, 0,
+             0.000950, 0, 0.000138, 0.000249, 0, 0, 0, 0, 0, 0],
+    # 富气: 乙烷、丙烷及重烃含量较高
+    "rich": [0.812, 0.012, 0.018, 0.094, 0.038, 0, 0, 0, 0, 0, 0.0065,
+             0.0085, 0.003, 0.003, 0.002, 0.001, 0.0005, 0.0003, 0.0002, 0, 0],
+    # 高含氢: 默认组分掺入 20% 氢气
+    "high_h2": [0.769321, 0.006885, 0.003654, 0.015984, 0.003087, 0, 0, 0.2, 0, 0, 0,
+                0.00076, 0, 0.00011, 0.000199, 0, 0, 0, 0, 0, 0],
+    # 酸性气: 含较多 CO2 与 H2S
+    "sour": [0.82, 0.02, 0.08, 0.03, 0.01, 0.0005, 0.035, 0, 0, 0, 0.001,
+             0.0015, 0.0005, 0.0005, 0.0005, 0, 0, 0, 0, 0.0005, 0],
+}
+
+TEMPERATURES = [263.15, 293.15, 333.15]          # K
+PRESSURES = [0.101325, 2.0, 6.0, 12.0]           # MPa
+TOLERANCES = [1e-5, 1e-7, 1e-9]
+REFERENCE_TOLERANCE = 1e-11
+
+
+def _z_and_iterations(result):
+    """从求解器返回的 (Z, pm, pr, p_density, iteration_count) 中取出 Z 与迭代次数。"""
+    return result[0], result[4]
+
+
+def _linear_scan(T, P0, x, tol, legacy=False):
+    """
+    线性扫描法的 iteration_count 是网格点序号，由粗到细扫描的实际压力计算次数远小于它，
+    因此另外通过 EvaluationCounter 取得计算次数，返回 (Z, iterations, evaluations)。
+    """
+    counter = EvaluationCounter()
+    result = calculate_z_factor_linear_scan(T, P0, x, step=1e-6, max_iterations=100000, tolerance=tol,
+                                            tracer=counter, legacy=legacy)
+    return result[0], result[4], counter.count
+
+
+# --- 求解器注册表 ---
+# 新的逐点求解器只需在此登记: run(T, P0, x, tolerance) -> (Z, iterations) 或 (Z, iterations, evaluations)
+# 未给出 evaluations 时压力计算次数按 iterations + 1 估计
+# max_pressure: 扫描类求解器的迭代次数随密度线性增长，只在低压点上测试
+SOLVERS = {
+    "bisection": {
+        "run": lambda T, P0, x, tol: _z_and_iterations(calculate_z_factor_bisection(T, P0, x, tolerance=tol)),
+        "max_pressure": None,
+    },
+    "newton": {
+        "run": lambda T, P0, x, tol: _z_and_iterations(calculate_z_factor_newton(T, P0, x, tolerance=tol)),
+        "max_pressure": None,
+    },
+    "numba": {
+        # 未安装 numba 时退化为 newton
+        "run": lambda T, P0, x, tol: _z_and_iterations(calculate_z_factor_numba(T, P0, x, tolerance=tol)),
+        "max_pressure": None,
+    },
+    "linear_scan": {
+        # 与 GUI 默认值一致: 步长 1e-6，最多 100000 次迭代
+        "run": lambda T, P0, x, tol: _linear_scan(T, P0, x, tol),
+        "max_pressure": 0.2,
+    },
+    "linear_scan_legacy": {
+        # 逐步扫描 (每个网格点一次压力计算)，与由粗到细扫描落在同一网格点
+        "run": lambda T, P0, x, tol: _linear_scan(T, P0, x, tol, legacy=True),
+        "max_pressure": 0.2,
+    },
+    "optimized": {
+        # 该版本不返回迭代次数
+        "run": lambda T, P0, x, tol: (calculate_z_factor_optimized(T, P0, x, max_iterations=100000,
+                                                                   tolerance=tol)[0], None),
+        "max_pressure": 0.2,
+    },
+}
+
+# 向量化求解器对整个 (T, P) 网格计时
+BATCH_SOLVERS = {
+    "batch": lambda T, P0, x, tol: _z_and_iterations(calculate_z_factor_batch(T, P0, x, tolerance=tol)),
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _reference_z(x, T, P0):
+    Z, _, _, _, _ = calculate_z_factor_bisection(T, P0, x, max_iterations=200, tolerance=REFERENCE_TOLERANCE)
+    return Z
+
 
-def run_benchmark(T, P0, x, max_iterations, tolerance):
+def run_benchmark(solver_names, compositions, temperatures, pressures, tolerances, repeats=3, include_slow=False):
     """
-    运行并比较三个版本计算函数的性能：
-    1. 原始 Numpy 版本
-    2. 纯 Python 版本
-    3. 优化版 Numpy 版本
+    在组分 x 温度 x 压力 x 精度网格上运行所选求解器。
+    每个点取 repeats 次中的最短耗时 (perf_counter)，并与高精度二分法的参考 Z 比较。
     """
-    print(f"--- 开始性能基准测试 (最大迭代: {max_iterations}, 精度: {tolerance}) ---")
-
-    # 测试原始 Numpy 版本
-    print("\n[1] 正在运行原始 Numpy 版本...")
-    start_time_numpy = time.time()
-    z_numpy, _, _, _ = calculate_z_factor(T, P0, x, max_iterations, tolerance)
-    end_time_numpy = time.time()
-    duration_numpy = end_time_numpy - start_time_numpy
-    print(f"原始 Numpy 版本计算结果 Z = {z_numpy}")
-    print(f"原始 Numpy 版本执行时间: {duration_numpy:.6f} 秒")
-
-    # 测试纯 Python 版本
-    print("\n[2] 正在运行纯 Python 版本...")
-    start_time_pure = time.time()
-    z_pure, _, _, _ = calculate_z_factor_pure(T, P0, x, max_iterations, tolerance)
-    end_time_pure = time.time()
-    duration_pure = end_time_pure - start_time_pure
-    print(f"纯 Python 版本计算结果 Z = {z_pure}")
-    print(f"纯 Python 版本执行时间: {duration_pure:.6f} 秒")
-
-    # 测试优化版 Numpy 版本
-    print("\n[3] 正在运行优化版 Numpy 版本...")
-    start_time_optimized = time.time()
-    z_optimized, _, _, _ = calculate_z_factor_optimized(T, P0, x, max_iterations, tolerance)
-    end_time_optimized = time.time()
-    duration_optimized = end_time_optimized - start_time_optimized
-    print(f"优化版 Numpy 版本计算结果 Z = {z_optimized}")
-    print(f"优化版 Numpy 版本执行时间: {duration_optimized:.6f} 秒")
-
-    # 性能对比
-    print("\n--- 最终性能对比 ---")
-    durations = {
-        "原始 Numpy": duration_numpy,
-        "纯 Python": duration_pure,
-        "优化版 Numpy": duration_optimized
+    records = []
+    for comp_name in compositions:
+        x = np.array(COMPOSITIONS[comp_name], dtype=float)
+        x /= x.sum()
+        reference = {(T, P0): _reference_z(x, T, P0) for T in temperatures for P0 in pressures}
+
+        for tol in tolerances:
+            for solver_name in solver_names:
+                if solver_name in BATCH_SOLVERS:
+                    T_grid, P_grid = np.meshgrid(temperatures, pressures, indexing="ij")
+                    best = float("inf")
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        Z, iters = BATCH_SOLVERS[solver_name](T_grid.ravel(), P_grid.ravel(), x, tol)
+                        best = min(best, time.perf_counter() - start)
+                    per_point = best / Z.size
+                    for j, (T, P0) in enumerate(zip(T_grid.ravel(), P_grid.ravel())):
+                        records.append(_record(solver_name, comp_name, float(T), float(P0), tol, per_point,
+                                               int(iters[j]), float(Z[j]), reference[(T, P0)]))
+                    continue
+
+                solver = SOLVERS[solver_name]
+                for T in temperatures:
+                    for P0 in pressures:
+                        if solver["max_pressure"] is not None and P0 > solver["max_pressure"] and not include_slow:
+                            continue
+                        best = float("inf")
+                        for _ in range(repeats):
+                            start = time.perf_counter()
+                            result = solver["run"](T, P0, x, tol)
+                            best = min(best, time.perf_counter() - start)
+                        Z, iters = result[0], result[1]
+                        evaluations = result[2] if len(result) > 2 else None
+                        records.append(_record(solver_name, comp_name, T, P0, tol, best, iters, float(Z),
+                                               reference[(T, P0)], evaluations))
+    return records
+
+
+def _record(solver, composition, T, P0, tolerance, seconds, iterations, Z, Z_ref, evaluations=None):
+    if evaluations is None and iterations is not None:
+        evaluations = iterations + 1
+    return {
+        "solver": solver,
+        "composition": composition,
+        "T": T,
+        "P_MPa": P0,
+        "tolerance": tolerance,
+        "seconds": seconds,
+        "iterations": iterations,
+        "evaluations": evaluations,
+        "evaluations_per_s": evaluations / seconds if evaluations is not None and seconds > 0 else None,
+        "Z": Z,
+        "abs_dZ": abs(Z - Z_ref),
+    }
+
+
+def summarize(records):
+    """按求解器汇总: 点数、总耗时、单点平均耗时、最大 |ΔZ|。"""
+    summary = {}
+    for rec in records:
+        s = summary.setdefault(rec["solver"], {"points": 0, "total_seconds": 0.0, "max_abs_dZ": 0.0})
+        s["points"] += 1
+        s["total_seconds"] += rec["seconds"]
+        s["max_abs_dZ"] = max(s["max_abs_dZ"], rec["abs_dZ"])
+    for s in summary.values():
+        s["mean_seconds_per_point"] = s["total_seconds"] / s["points"]
+    return summary
+
+
+def compare(current, baseline, time_threshold=1.2, dz_threshold=1e-9):
+    """
+    与之前保存的基准结果比较，返回回归列表。
+    单点平均耗时增长超过 time_threshold 倍，或最大 |ΔZ| 增加超过 dz_threshold 时视为回归。
+    """
+    regressions = []
+    for solver, cur in current["summary"].items():
+        base = baseline.get("summary", {}).get(solver)
+        if base is None:
+            continue
+        ratio = cur["mean_seconds_per_point"] / base["mean_seconds_per_point"]
+        if ratio > time_threshold:
+            regressions.append(f"{solver}: 单点平均耗时变为基准的 {ratio:.2f} 倍")
+        if cur["max_abs_dZ"] > base["max_abs_dZ"] + dz_threshold:
+            regressions.append(f"{solver}: 最大 |ΔZ| 从 {base['max_abs_dZ']:.3e} 增至 {cur['max_abs_dZ']:.3e}")
+    return regressions
+
+
+def main(argv=None):
+    all_solvers = list(SOLVERS) + list(BATCH_SOLVERS)
+    parser = argparse.ArgumentParser(description="AGA8-92DC 压缩因子求解器性能基准测试")
+    parser.add_argument("--solvers", nargs="+", default=all_solvers, choices=all_solvers)
+    parser.add_argument("--compositions", nargs="+", default=list(COMPOSITIONS), choices=list(COMPOSITIONS))
+    parser.add_argument("--tolerances", nargs="+", type=float, default=TOLERANCES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--include-slow", action="store_true", help="扫描类求解器也在高压点上运行 (耗时很长)")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果比较，发现回归时返回非零退出码")
+    args = parser.parse_args(argv)
+
+    if "numba" in args.solvers:
+        numba_warmup()  # JIT 编译不计入计时
+    records = run_benchmark(args.solvers, args.compositions, TEMPERATURES, PRESSURES, args.tolerances,
+                            repeats=args.repeats, include_slow=args.include_slow)
+    result = {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeats": args.repeats,
+        },
+        "summary": summarize(records),
+        "records": records,
     }
-    
-    sorted_versions = sorted(durations.items(), key=lambda item: item[1])
-    
-    print("性能排名:")
-    for i, (version, duration) in enumerate(sorted_versions):
-        print(f"{i+1}. {version}: {duration:.6f} 秒")
 
-    fastest_version, fastest_time = sorted_versions[0]
-    slowest_version, slowest_time = sorted_versions[-1]
+    print(f"{'求解器':<12}{'点数':>6}{'单点平均耗时(s)':>18}{'最大|ΔZ|':>14}")
+    for solver, s in sorted(result["summary"].items(), key=lambda item: item[1]["mean_seconds_per_point"]):
+        print(f"{solver:<12}{s['points']:>6}{s['mean_seconds_per_point']:>18.6e}{s['max_abs_dZ']:>14.3e}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(result, fp, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        regressions = compare(result, baseline)
+        if regressions:
+            print("发现性能/精度回归:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("与基准相比未发现回归。")
+    return 0
 
-    if fastest_time > 0:
-        speedup = slowest_time / fastest_time
-        print(f"\n最快的版本 ({fastest_version}) 相比最慢的版本 ({slowest_version}) 快了 {speedup:.2f} 倍。")
 
 if __name__ == '__main__':
-    # 可配置的输入参数
-    T_in = 293.15
-    P0_in = 0.101325
-    x_in = np.array([0.961651, 0.008606, 0.004567, 0.01998, 0.003859, 0,
-                     0, 0, 0, 0, 0, 0.000950, 0, 0.000138, 0.000249, 0, 0, 0, 0, 0, 0])
-    
-    # 运行多组测试
-    tolerances = [1e-5, 1e-7, 1e-9]
-    max_iter = 500000 # 设置一个足够大的迭代上限
-
-    for tol in tolerances:
-        run_benchmark(T_in, P0_in, x_in, max_iter, tol)
-        print("\n" + "="*70 + "\n")
\ No newline at end of file
+    raise SystemExit(main())
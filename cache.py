@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+计算结果缓存模块。
+提供一个线程安全、容量有限的 LRU 缓存 (可选 TTL)，用于在 API 层缓存压缩因子计算结果。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    容量有限的 LRU 结果缓存。
+
+    maxsize: 最大条目数，为 0 时禁用缓存。
+    ttl: 条目存活时间 (秒)，为 None 或 0 时永不过期。
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """查找缓存，命中时返回值，否则返回 None。"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
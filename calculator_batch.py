@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+向量化批量计算模块。
+对一组 (T, P) 点同时进行密度求根: 每次迭代只对尚未收敛的点做一次数组运算，
+用于历史数据回填等需要大批量计算 Z 的场景。
+"""
+import numpy as np
+from constants import *
+from mixture import (PreparedMixture, prepare_mixture, mixture_parameters, blend_parameters,
+                     isotherm_terms, isotherm_pressures, multiple_roots)
+from parameter_pack import PARAMS, EXP_CLASSES, MAX_POWER
+
+# SUM2 的多项式系数矩阵由 parameter_pack 在导入时构建 (见 parameter_pack._series_matrices)
+_EXP_CLASSES = EXP_CLASSES
+_MAX_POWER = MAX_POWER
+_P_MAT, _D_MAT = PARAMS.P_mat, PARAMS.D_mat
+
+
+_PARAMETER_NAMES = ("B_coeffs", "G0", "Q0", "F0", "U0", "K0", "M0")
+
+
+def _mixture_arrays(x, n_points):
+    """
+    把组分输入整理为逐点的混合物参数。
+    返回 (params, index)，其中 params 为 mixture_parameters 形式的字典 (每个唯一组分一行)，
+    index[i] 为第 i 个点所用组分的行号。
+    """
+    if isinstance(x, PreparedMixture) or np.ndim(x) == 1:
+        mixture = prepare_mixture(x)
+        params = {name: np.array([getattr(mixture, name)]) for name in _PARAMETER_NAMES}
+        return params, np.zeros(n_points, dtype=np.intp)
+    x = np.asarray(x, dtype=float)
+    if x.ndim != 2 or x.shape != (n_points, N):
+        raise ValueError(f"二维组分数组的形状必须为 ({n_points}, {N})，当前为 {x.shape}。")
+    # 组分通常变化缓慢，只对唯一组分计算混合物参数 (整个矩阵一次完成)
+    unique_x, index = _unique_rows(x)
+    return mixture_parameters(unique_x), index
+
+
+def _unique_rows(x):
+    """
+    与 np.unique(x, axis=0, return_inverse=True) 结果相同的唯一行查找。
+    先按行在固定随机方向上的投影做一维去重 (比按行排序快得多)，再逐行核对；
+    投影碰撞 (不同的行投影相同) 时退回到 np.unique。
+    """
+    projection = x @ _ROW_PROJECTION
+    _, first, index = np.unique(projection, return_index=True, return_inverse=True)
+    unique_x = x[first]
+    if np.array_equal(unique_x[index], x):
+        return unique_x, index.reshape(-1)
+    unique_x, index = np.unique(x, axis=0, return_inverse=True)
+    return unique_x, index.reshape(-1)
+
+
+_ROW_PROJECTION = np.random.default_rng(20).uniform(0.5, 1.5, N)
+
+
+def _pressure_and_derivative(pm, T, B_calc, SUM1, K0_3, coefP, coefD):
+    """对一组点同时计算压力 P 及 dP/dpm。"""
+    pr = K0_3 * pm
+    powers = np.empty((pm.size, _MAX_POWER))
+    powers[:, 0] = 1.0
+    powers[:, 1:] = pr[:, None]
+    np.cumprod(powers, axis=1, out=powers)
+
+    exps = np.empty((pm.size, _EXP_CLASSES))
+    exps[:, 0] = 1.0
+    exps[:, 1:] = np.exp(-powers[:, 1:_EXP_CLASSES])
+
+    SUM2 = np.einsum('nej,nj,ne->n', coefP.reshape(-1, _EXP_CLASSES, _MAX_POWER), powers, exps, optimize=True)
+    dSUM2 = np.einsum('nej,nj,ne->n', coefD.reshape(-1, _EXP_CLASSES, _MAX_POWER), powers, exps, optimize=True)
+
+    RT = R * T
+    P = pm * RT * (1 + B_calc * pm - pr * SUM1 + SUM2)
+    dPdpm = RT * (1 + 2 * B_calc * pm - 2 * pr * SUM1 + dSUM2)
+    return P, dPdpm, pr
+
+
+def calculate_z_factor_batch(T, P0, x, max_iterations=100, tolerance=0.00001):
+    """
+    对数组形式的 (T, P0) 批量计算天然气压缩因子Z。
+
+    T, P0 可以是任意可广播的数组 (单位 K / MPa)；x 可以是21元组分数组、PreparedMixture，
+    或与点数一致的 (n, 21) 二维组分数组。
+    所有点同时使用带保护的牛顿法求解摩尔密度 (有根区间的确定与单调性检查同 calculate_z_factor_newton)。
+    返回 (Z, pm, pr, p_density, iteration_count)，均为与输入同形状的数组；
+    压力非单调或找不到根的点 Z 等为 NaN，iteration_count 为 max_iterations (按未收敛处理)。
+    """
+    T, P0 = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P0, dtype=float))
+    shape = T.shape
+    params, index = _mixture_arrays(x, T.size)
+    # tabulate_second_virial 得到的混合物使用其插值 B(T)，与逐点求解器一致
+    B_calc = x.second_virial_array(T.ravel()) if isinstance(x, PreparedMixture) and x.tabulated else None
+    results = _solve_points(T.ravel(), P0.ravel(), params, index, max_iterations, tolerance, B_calc=B_calc)
+    return tuple(values.reshape(shape) for values in results)
+
+
+def calculate_z_factor_matrix(T, P0, X, max_iterations=100, tolerance=0.00001):
+    """
+    对 (M, 21) 组分矩阵的每一行，在同一组 (T, P0) 条件下计算压缩因子 (组分 x 工况的全组合)。
+
+    T, P0 为可广播的数组 (形状记为 S)；全部组分的混合物参数由 mixture_parameters 一次算出，
+    M*|S| 个点的密度在同一次向量化牛顿迭代中求解。
+    返回 (Z, pm, pr, p_density, iteration_count)，均为形状 (M,) + S 的数组。
+    """
+    return _solve_rows(T, P0, mixture_parameters(X), max_iterations, tolerance)
+
+
+def calculate_z_factor_blend(T, P0, x_a, x_b, alpha, beta, max_iterations=100, tolerance=0.00001):
+    """
+    对一组混合比例 x = alpha[i]*x_a + beta[i]*x_b (如基础气掺氢) 在同一组 (T, P0) 条件下计算压缩因子。
+    混合物参数由 blend_parameters 从预先算好的两两组分和组合得到，其余与 calculate_z_factor_matrix 相同。
+    返回 (Z, pm, pr, p_density, iteration_count)，均为形状 (len(alpha),) + S 的数组。
+    """
+    return _solve_rows(T, P0, blend_parameters(x_a, x_b, alpha, beta), max_iterations, tolerance)
+
+
+def _solve_rows(T, P0, params, max_iterations, tolerance):
+    """params 的每一行 (一个组分) 与可广播的 (T, P0) 全组合求解，返回形状 (行数,) + S 的数组。"""
+    T, P0 = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P0, dtype=float))
+    n_rows, n_points = params["M0"].size, T.size
+    index = np.repeat(np.arange(n_rows), n_points)
+    results = _solve_points(np.tile(T.ravel(), n_rows), np.tile(P0.ravel(), n_rows), params, index,
+                            max_iterations, tolerance)
+    return tuple(values.reshape((n_rows,) + T.shape) for values in results)
+
+
+def _solve_points(T, P0, params, index, max_iterations, tolerance, B_calc=None):
+    """
+    一维的 T、P0 逐点求解。params 为每个唯一组分一行的混合物参数，index[i] 为第 i 个点所用的行。
+    B_calc 给出时直接作为各点的第二维利系数 (否则由 B_coeffs 计算)。
+    返回 (Z, pm, pr, p_density, iteration_count) 一维数组。
+    """
+    n_points = T.size
+
+    # 组分相关的量: 每个唯一组分一行
+    B_coeffs = params["B_coeffs"]
+    G0 = params["G0"][:, None]
+    Q0 = params["Q0"][:, None]
+    F0 = params["F0"][:, None]
+    U0 = params["U0"][:, None]
+    K0 = params["K0"]
+    M0 = params["M0"]
+    p = PARAMS
+    Cn_mix = p.a_n * ((G0 + 1 - p.g_n)**p.g_n) * \
+             (((Q0**2) + 1 - p.q_n)**p.q_n) * \
+             ((F0 + 1 - p.f_n)**p.f_n) * \
+             (U0**p.u_n)
+
+    # 温度相关的量: 每个点一行，整个求根过程中保持不变
+    if B_calc is None:
+        B_calc = np.sum(p.a_B * T[:, None]**(-p.u_B) * B_coeffs[index], axis=1)
+    Cn = Cn_mix[index] * T[:, None]**(-p.u_n)
+    SUM1 = np.sum(Cn[:, :6], axis=1)
+    coefP = Cn @ _P_MAT
+    coefD = Cn @ _D_MAT
+    K0_3 = K0[index]**3
+
+    # 初值: 第二维利系数修正后的理想气体密度，并以其为中心确定有根区间 (同 IsothermalState.bracket)
+    def evaluate(pm_s, sel):
+        return _pressure_and_derivative(pm_s, T[sel], B_calc[sel], SUM1[sel], K0_3[sel], coefP[sel], coefD[sel])
+
+    pm, pm_low, pm_high, failed = _bracket_points(P0, B_calc, T, evaluate)
+    # P0 对应多个密度的点 (等温线呈 S 形) 不取其中任意一个根，同样按失败处理
+    failed |= _multiple_root_points(T, P0, B_calc, SUM1, Cn, K0, index)
+    pm = np.where((pm > pm_low) & (pm < pm_high), pm, (pm_low + pm_high) / 2)
+
+    pr = K0_3 * pm
+    iteration_count = np.full(n_points, max_iterations, dtype=np.int64)
+    active = np.flatnonzero(~failed)
+
+    for it in range(max_iterations):
+        if active.size == 0:
+            break
+        pm_a = pm[active]
+        P, dPdpm, pr_a = _pressure_and_derivative(pm_a, T[active], B_calc[active], SUM1[active],
+                                                  K0_3[active], coefP[active], coefD[active])
+        pr[active] = pr_a
+
+        # dP/dpm <= 0: 区间内压力非单调 (可能有多个根)，按未收敛处理
+        non_monotonic = ~(dPdpm > 0)
+        failed[active[non_monotonic]] = True
+        done = (np.abs(P - P0[active]) < tolerance) & ~non_monotonic
+        iteration_count[active[done]] = it
+
+        below = P < P0[active]
+        low = np.where(below, pm_a, pm_low[active])
+        high = np.where(below, pm_high[active], pm_a)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pm_next = pm_a - (P - P0[active]) / dPdpm
+        bad = ~(pm_next > low) | ~(pm_next < high)
+        pm_next = np.where(bad, (low + high) / 2, pm_next)
+
+        keep = ~done & ~non_monotonic
+        pm_low[active] = low
+        pm_high[active] = high
+        pm[active[keep]] = pm_next[keep]
+        active = active[keep]
+
+    pm[failed] = np.nan
+    pr[failed] = np.nan
+    Z = P0 / (pm * R * T)
+    p_density = M0[index] * pm
+
+    return Z, pm, pr, p_density, iteration_count
+
+
+def _multiple_root_points(T, P0, B_calc, SUM1, Cn, K0, index, chunk=1024):
+    """
+    IsothermalState.has_multiple_roots 的向量化版本: 按组分分组，在 ISOTHERM_GRID 上采样各点的等温线，
+    返回 P0 对应多个密度的点 (布尔数组)。每个组分的 isotherm_terms 只算一次，各点只需一次矩阵乘法。
+    """
+    ambiguous = np.zeros(T.size, dtype=bool)
+    order = np.argsort(index, kind='stable')
+    rows, starts = np.unique(index[order], return_index=True)
+    for row, points in zip(rows.tolist(), np.split(order, starts[1:])):
+        K0_3 = K0[row]**3
+        terms = isotherm_terms(K0_3)
+        for start in range(0, points.size, chunk):
+            sel = points[start:start + chunk]
+            P_grid = isotherm_pressures(terms, T[sel], B_calc[sel], SUM1[sel], Cn[sel], K0_3)
+            ambiguous[sel] = multiple_roots(P_grid, P0[sel])
+    return ambiguous
+
+
+def _bracket_points(P0, B_calc, T, evaluate, rel_width=0.05, growth=2.0, max_density=100.0,
+                    interior_samples=8):
+    """
+    IsothermalState.bracket 的向量化版本: 从维利密度估计出发，对每个点向未包含根的一侧几何扩展区间。
+    evaluate(pm, sel) 计算 sel 所选各点在 pm 处的 (P, dP/dpm, pr)。
+    返回 (guess, pm_low, pm_high, failed)；压力非单调 (含扩展区间内抽查到的 S 形段)、
+    区间内无根或输入无效的点 failed 为 True，由调用方按未收敛处理。
+    """
+    pm_ideal = P0 / (R * T)
+    Z_virial = 1 + B_calc * pm_ideal
+    guess = np.where(Z_virial > 0, pm_ideal / np.where(Z_virial > 0, Z_virial, 1.0), pm_ideal)
+    guess = np.clip(guess, 1e-12, max_density)
+    n_points = guess.size
+    failed = ~(P0 > 0) | ~np.isfinite(guess)
+    width = np.full(n_points, rel_width)
+    pm_low = guess * (1 - width)
+    pm_high = np.minimum(guess * (1 + width), max_density)
+
+    sel = np.flatnonzero(~failed)
+    P_low = np.zeros(n_points)
+    P_high = np.zeros(n_points)
+    P_low[sel], d_low, _ = evaluate(pm_low[sel], sel)
+    P_high[sel], d_high, _ = evaluate(pm_high[sel], sel)
+    failed[sel[~(d_low > 0) | ~(d_high > 0)]] = True
+    expanded = np.zeros(n_points, dtype=bool)
+
+    while True:
+        up = np.flatnonzero(~failed & (P_high < P0))
+        down = np.flatnonzero(~failed & (P_low > P0))
+        if up.size == 0 and down.size == 0:
+            break
+        expanded[up] = True
+        expanded[down] = True
+
+        # 上端扩展
+        failed[up[pm_high[up] >= max_density]] = True
+        up = up[pm_high[up] < max_density]
+        width[up] *= growth
+        pm_next = np.minimum(guess[up] * (1 + width[up]), max_density)
+        P_next, d_next, _ = evaluate(pm_next, up)
+        failed[up[~(d_next > 0) | ~(P_next > P_high[up])]] = True
+        pm_low[up], P_low[up] = pm_high[up], P_high[up]
+        pm_high[up], P_high[up] = pm_next, P_next
+
+        # 下端扩展 (P(0) = 0 < P0，因此最多扩展到 0)
+        width[down] *= growth
+        pm_next = np.where(width[down] < 1, guess[down] * (1 - width[down]), 0.0)
+        P_next = np.zeros(down.size)
+        d_next = np.ones(down.size)
+        positive = pm_next > 0
+        if positive.any():
+            P_next[positive], d_next[positive], _ = evaluate(pm_next[positive], down[positive])
+        failed[down[~(d_next > 0) | ~(P_next < P_low[down])]] = True
+        pm_high[down], P_high[down] = pm_low[down], P_low[down]
+        pm_low[down], P_low[down] = pm_next, P_next
+
+    # 扩展过的 (可能很宽的) 区间内等距抽查单调性
+    check = np.flatnonzero(expanded & ~failed)
+    if check.size and interior_samples > 0:
+        fractions = np.arange(1, interior_samples + 1) / (interior_samples + 1)
+        samples = pm_low[check, None] + (pm_high - pm_low)[check, None] * fractions
+        rows = np.repeat(check, interior_samples)
+        P_s, d_s, _ = evaluate(samples.ravel(), rows)
+        P_s = np.concatenate((P_low[check, None], P_s.reshape(-1, interior_samples)), axis=1)
+        monotonic = np.all(d_s.reshape(-1, interior_samples) > 0, axis=1) & np.all(np.diff(P_s, axis=1) > 0, axis=1)
+        failed[check[~monotonic]] = True
+
+    return guess, pm_low, pm_high, failed
+
+
+if __name__ == '__main__':
+    import time
+    x_in = np.array([0.961651, 0.008606, 0.004567, 0.01998, 0.003859, 0,
+                     0, 0, 0, 0, 0, 0.000950, 0, 0.000138, 0.000249, 0, 0, 0, 0, 0, 0])
+    n = 100000
+    rng = np.random.default_rng(0)
+    T_in = rng.uniform(263.15, 333.15, n)
+    P_in = rng.uniform(0.1, 12.0, n)
+
+    start = time.perf_counter()
+    Z, pm, pr, p_density, iters = calculate_z_factor_batch(T_in, P_in, x_in)
+    duration = time.perf_counter() - start
+    print(f"{n} 个点计算完成，耗时 {duration:.3f} 秒 ({n / duration:.0f} 点/秒)，最大迭代次数 {iters.max()}")
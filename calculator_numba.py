@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Numba JIT 求解后端 (可选)。
+安装了 numba 时，把第二维利系数的组分加权和、混合参数、压力方程及密度求根编译为本地循环，
+编译结果缓存到磁盘 (cache=True)，进程重启后无需重新编译；
+未安装 numba 时 calculate_z_factor_numba 退化为 calculator.calculate_z_factor_newton。
+"""
+import numpy as np
+from constants import *
+from mixture import PreparedMixture, prepare_mixture
+from parameter_pack import PARAMS
+from tracing import resolve_tracer, TRACE_SUMMARY
+from jit_support import NUMBA_AVAILABLE, jit_or_identity
+
+
+# 求根状态码
+_STATUS_OK = 0
+_STATUS_NON_MONOTONIC = 1
+_STATUS_NO_ROOT = 2
+_STATUS_INVALID = 3  # 压力计算结果不是有限值 (温度或组分无效)
+_STATUS_MULTIPLE_ROOTS = 4  # 等温线呈 S 形，P0 对应多个密度
+# 扩展后的有根区间内抽查单调性的点数 (与 IsothermalState.bracket 的默认值一致)
+_INTERIOR_SAMPLES = 8
+
+
+@jit_or_identity
+def _mixture_kernel(x, pair_i, pair_j, B_pair, G0_pair, U0_pair, K0_pair, E, G, Q, F, K, M):
+    """
+    基于上三角压缩常数表计算 B 的 18 个组分加权和及 G0, Q0, F0, U0, K0, M0
+    (跳过摩尔分数为 0 的组分对)。
+    """
+    B_coeffs = np.zeros(18)
+    G0_term = 0.0
+    U0_term = 0.0
+    K0_term = 0.0
+    for p in range(pair_i.shape[0]):
+        xx = x[pair_i[p]] * x[pair_j[p]]
+        if xx == 0.0:
+            continue
+        for n in range(18):
+            B_coeffs[n] += B_pair[n, p] * xx
+        G0_term += G0_pair[p] * xx
+        U0_term += U0_pair[p] * xx
+        K0_term += K0_pair[p] * xx
+
+    F0 = 0.0
+    Q0 = 0.0
+    G0 = 0.0
+    sum2_E = 0.0
+    sum1_K = 0.0
+    M0 = 0.0
+    for i in range(x.shape[0]):
+        F0 += x[i]**2 * F[i]
+        Q0 += x[i] * Q[i]
+        G0 += x[i] * G[i]
+        sum2_E += x[i] * E[i]**2.5
+        sum1_K += x[i] * K[i]**2.5
+        M0 += x[i] * M[i]
+    G0 += G0_term
+    U0 = (sum2_E**2 + U0_term)**0.2
+    K0 = (sum1_K**2 + 2 * K0_term)**0.2
+    return B_coeffs, G0, Q0, F0, U0, K0, M0
+
+
+@jit_or_identity
+def _state_kernel(T, B_coeffs, G0, Q0, F0, U0, a_B, u_B, a_n, u_n, g_n, q_n, f_n):
+    """计算温度 T 下的 B 以及 n=12..57 的 Cn。"""
+    B_calc = 0.0
+    for n in range(18):
+        B_calc += a_B[n] * T**(-u_B[n]) * B_coeffs[n]
+    Cn = np.empty(46)
+    for idx in range(46):
+        Cn[idx] = a_n[idx] * ((G0 + 1 - g_n[idx])**g_n[idx]) * (((Q0**2) + 1 - q_n[idx])**q_n[idx]) * \
+                  ((F0 + 1 - f_n[idx])**f_n[idx]) * (U0**u_n[idx]) * (T**(-u_n[idx]))
+    return B_calc, Cn
+
+
+@jit_or_identity
+def _pressure_kernel(pm, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n):
+    """计算压力 P 及 dP/dpm。"""
+    pr = K0_3 * pm
+    SUM2 = 0.0
+    dSUM2 = 0.0
+    for idx in range(46):
+        ck_pr_k = c_n[idx] * k_n[idx] * pr**k_n[idx]
+        base = pr**b_n[idx] * np.exp(-c_n[idx] * pr**k_n[idx])
+        SUM2 += Cn[idx] * (b_n[idx] - ck_pr_k) * base
+        dSUM2 += Cn[idx] * ((b_n[idx] - ck_pr_k) * (1 + b_n[idx] - ck_pr_k) - ck_pr_k * k_n[idx]) * base
+    P = pm * R * T * (1 + B_calc * pm - pr * SUM1 + SUM2)
+    dPdpm = R * T * (1 + 2 * B_calc * pm - 2 * pr * SUM1 + dSUM2)
+    return P, dPdpm
+
+
+@jit_or_identity
+def _multiple_roots_kernel(T, P0, B_calc, SUM1, K0_3, Cn, terms):
+    """IsothermalState.has_multiple_roots 的编译版本: P0 在采样的等温线上是否对应多个密度。"""
+    n = terms.shape[0]
+    P = np.empty(n)
+    for i in range(n):
+        # terms 为 mixture.isotherm_terms: 前 46 列为 pm*SUM2 各项，后两列为 pm^2 与 pm
+        total = (B_calc - K0_3 * SUM1) * terms[i, 46] + terms[i, 47]
+        for idx in range(46):
+            total += Cn[idx] * terms[i, idx]
+        P[i] = R * T * total
+    # 存在 i < j 使 P_i > P0 > P_j 即有多个根: 比较前缀最大值与后缀最小值 (见 mixture.pressure_envelope)
+    lower = np.empty(n)
+    lower[n - 1] = P[n - 1]
+    for i in range(n - 2, -1, -1):
+        lower[i] = min(lower[i + 1], P[i])
+    upper = P[0]
+    for i in range(n):
+        upper = max(upper, P[i])
+        if lower[i] < P0 < upper:
+            return True
+    return False
+
+
+@jit_or_identity
+def _solve_kernel(T, P0, B_calc, K0_3, Cn, b_n, c_n, k_n, tolerance, max_iterations, max_density, terms):
+    """
+    与 IsothermalState.bracket + calculate_z_factor_newton 相同的算法:
+    先检查 P0 是否对应多个密度，再从维利密度估计出发几何扩展出有根区间，最后做带保护的牛顿迭代。
+    返回 (pm, 迭代次数, 状态码)。
+    比较均写成 not (d > 0) 的形式，使 NaN 也被判为失败 (与 IsothermalState 一致)。
+    """
+    SUM1 = 0.0
+    for idx in range(6):
+        SUM1 += Cn[idx]
+    if _multiple_roots_kernel(T, P0, B_calc, SUM1, K0_3, Cn, terms):
+        return 0.0, 0, _STATUS_MULTIPLE_ROOTS
+
+    pm_ideal = P0 / (R * T)
+    Z_virial = 1 + B_calc * pm_ideal
+    guess = pm_ideal / Z_virial if Z_virial > 0 else pm_ideal
+    if not np.isfinite(guess):
+        return guess, 0, _STATUS_INVALID
+    guess = min(max(guess, 1e-12), max_density)
+
+    # 确定有根区间
+    width = 0.05
+    pm_low = guess * (1 - width)
+    pm_high = min(guess * (1 + width), max_density)
+    P_low, d_low = _pressure_kernel(pm_low, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n)
+    P_high, d_high = _pressure_kernel(pm_high, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n)
+    if not (np.isfinite(P_low) and np.isfinite(P_high)):
+        return guess, 0, _STATUS_INVALID
+    if not (d_low > 0 and d_high > 0):
+        return guess, 0, _STATUS_NON_MONOTONIC
+    expanded = False
+    while P_high < P0:
+        if pm_high >= max_density:
+            return guess, 0, _STATUS_NO_ROOT
+        width *= 2.0
+        pm_next = min(guess * (1 + width), max_density)
+        P_next, d_next = _pressure_kernel(pm_next, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n)
+        if not np.isfinite(P_next):
+            return guess, 0, _STATUS_INVALID
+        if not (d_next > 0 and P_next > P_high):
+            return guess, 0, _STATUS_NON_MONOTONIC
+        pm_low, P_low = pm_high, P_high
+        pm_high, P_high = pm_next, P_next
+        expanded = True
+    while P_low > P0:
+        width *= 2.0
+        pm_next = guess * (1 - width) if width < 1 else 0.0
+        P_next = 0.0
+        d_next = 1.0
+        if pm_next > 0:
+            P_next, d_next = _pressure_kernel(pm_next, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n)
+        if not np.isfinite(P_next):
+            return guess, 0, _STATUS_INVALID
+        if not (d_next > 0 and P_next < P_low):
+            return guess, 0, _STATUS_NON_MONOTONIC
+        pm_high, P_high = pm_low, P_low
+        pm_low, P_low = pm_next, P_next
+        expanded = True
+    if expanded:
+        # 扩展后的宽区间内等距抽查单调性 (同 IsothermalState.bracket 的 interior_samples)
+        P_prev = P_low
+        for idx in range(1, _INTERIOR_SAMPLES + 1):
+            pm_s = pm_low + (pm_high - pm_low) * idx / (_INTERIOR_SAMPLES + 1)
+            P_s, d_s = _pressure_kernel(pm_s, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n)
+            if not (d_s > 0 and P_s > P_prev):
+                return guess, 0, _STATUS_NON_MONOTONIC
+            P_prev = P_s
+
+    # 带保护的牛顿迭代
+    pm = guess
+    if not (pm_low < pm < pm_high):
+        pm = (pm_low + pm_high) / 2
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        P, dPdpm = _pressure_kernel(pm, T, B_calc, SUM1, K0_3, Cn, b_n, c_n, k_n)
+        if not np.isfinite(P):
+            return pm, iteration_count, _STATUS_INVALID
+        if not dPdpm > 0:
+            return pm, iteration_count, _STATUS_NON_MONOTONIC
+        if abs(P - P0) < tolerance:
+            break
+        if P < P0:
+            pm_low = pm
+        else:
+            pm_high = pm
+        pm_next = pm - (P - P0) / dPdpm
+        if not (pm_low < pm_next < pm_high):
+            pm_next = (pm_low + pm_high) / 2
+        pm = pm_next
+        iteration_count += 1
+    return pm, iteration_count, _STATUS_OK
+
+
+def _mixture_params(x):
+    """返回 (B_coeffs, G0, Q0, F0, U0, K0, M0)；已预处理的混合物直接取其缓存值。"""
+    if isinstance(x, PreparedMixture):
+        return x.B_coeffs, x.G0, x.Q0, x.F0, x.U0, x.K0, x.M0
+    x = np.ascontiguousarray(x, dtype=float)
+    if x.shape != (N,):
+        raise ValueError(f"组分向量长度必须为 {N}，当前为 {x.shape}。")
+    if not np.all(np.isfinite(x)):
+        raise ValueError("组分向量中含有无效的摩尔分数 (NaN 或无穷大)。")
+    p = PARAMS
+    return _mixture_kernel(x, p.pair_i, p.pair_j, p.B_pair, p.G0_pair, p.U0_pair, p.K0_pair, E, G, Q, F, K, M)
+
+
+def calculate_z_factor_numba(T, P0, x, max_iterations=100, tolerance=0.00001, log_callback=None, tracer=None):
+    """
+    使用 Numba 编译的内核计算天然气压缩因子Z (算法与 calculate_z_factor_newton 相同)。
+    未安装 numba 时直接调用 calculate_z_factor_newton。返回值与其他求解器相同。
+    """
+    if not NUMBA_AVAILABLE:
+        from calculator import calculate_z_factor_newton
+        return calculate_z_factor_newton(T, P0, x, max_iterations=max_iterations, tolerance=tolerance,
+                                         log_callback=log_callback, tracer=tracer)
+
+    tracer = resolve_tracer(tracer, log_callback)
+    trace_summary = tracer.level >= TRACE_SUMMARY
+    if trace_summary:
+        tracer.message("开始压力迭代计算 (Numba 牛顿法)...\n")
+
+    if not P0 > 0:
+        raise ValueError(f"目标压力必须为正数，当前为 P0={P0}。")
+    if not T > 0:
+        raise ValueError(f"温度必须为正数，当前为 T={T}。")
+    B_coeffs, G0, Q0, F0, U0, K0, M0 = _mixture_params(x)
+    p = PARAMS
+    B_calc, Cn = _state_kernel(float(T), B_coeffs, G0, Q0, F0, U0, p.a_B, p.u_B, p.a_n, p.u_n, p.g_n, p.q_n, p.f_n)
+    if isinstance(x, PreparedMixture) and x.tabulated:
+        # tabulate_second_virial 得到的混合物使用其插值 B(T)，与 calculate_z_factor_newton 一致
+        B_calc = x.second_virial(float(T))
+    K0_3 = K0**3
+    # 多根检查所需的 SUM2 各项采样只与组分有关，由 (缓存的) PreparedMixture 保存
+    terms = prepare_mixture(x).isotherm_terms()
+    pm, iteration_count, status = _solve_kernel(float(T), float(P0), B_calc, K0_3, Cn, p.b_n, p.c_n, p.k_n,
+                                                float(tolerance), int(max_iterations), 100.0, terms)
+    if status == _STATUS_MULTIPLE_ROOTS:
+        raise ValueError(f"T={T} K 下压力 P0={P0} MPa 对应多个密度 (等温线呈 S 形，可能处于两相区)，无法确定唯一解。")
+    if status == _STATUS_NON_MONOTONIC:
+        raise ValueError(f"在 T={T} K, P0={P0} MPa 附近压力不随密度单调变化 (可能处于近临界或类液体区域)，无法可靠求解。")
+    if status == _STATUS_INVALID:
+        raise ValueError(f"在 T={T} K, P0={P0} MPa 处压力计算结果无效，请检查温度与组分。")
+    if status == _STATUS_NO_ROOT:
+        raise ValueError(f"在 [0, 100] mol/L 内找不到压力 P0={P0} MPa 对应的密度。")
+
+    if iteration_count == max_iterations and trace_summary:
+        tracer.message("警告: 已达到最大迭代次数，结果可能不准确。\n")
+    elif trace_summary:
+        tracer.message(f"迭代完成，共 {iteration_count+1} 次。\n")
+
+    Z = P0 / (pm * R * T)
+    pr = K0_3 * pm
+    p_density = M0 * pm
+    return Z, pm, pr, p_density, iteration_count
+
+
+def warmup():
+    """触发 (或从磁盘缓存加载) 所有内核的编译，供服务启动时调用。"""
+    if not NUMBA_AVAILABLE:
+        return
+    x = np.zeros(N)
+    x[0] = 1.0
+    calculate_z_factor_numba(288.15, 0.101325, x)
+
+
+if __name__ == '__main__':
+    import time
+    T_in = 293.15
+    P0_in = 0.101325
+    x_in = np.array([0.961651, 0.008606, 0.004567, 0.01998, 0.003859, 0,
+                     0, 0, 0, 0, 0, 0.000950, 0, 0.000138, 0.000249, 0, 0, 0, 0, 0, 0])
+    start = time.perf_counter()
+    warmup()
+    print(f"numba 可用: {NUMBA_AVAILABLE}，编译/加载耗时 {time.perf_counter() - start:.3f} 秒")
+    start = time.perf_counter()
+    result = calculate_z_factor_numba(T_in, P0_in, x_in, log_callback=print)
+    print(result, f"{time.perf_counter() - start:.6f} 秒")
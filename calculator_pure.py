@@ -1,92 +1,123 @@
 import math
 from constants import *
+from mixture import prepare_mixture
+from tracing import resolve_tracer, TRACE_SUMMARY, TRACE_ITERATIONS
 
-def calculate_z_factor_linear_scan(T, P0, x, step=0.000001, max_iterations=1000000, tolerance=0.00001, log_callback=None):
+def calculate_z_factor_linear_scan(T, P0, x, step=0.000001, max_iterations=1000000, tolerance=0.00001, log_callback=None, tracer=None, legacy=False):
     """
     使用线性扫描法计算天然气压缩因子Z。
+    扫描网格为 pm_k = 0.01 + k*step (k = 0 .. max_iterations-1)，结果为第一个满足 |P - P0| < tolerance 的网格点。
+
+    默认采用由粗到细的扫描: 先以倍增的步幅 (1, 2, 4, ... 个网格步) 向前跳跃，找到压力越过 P0 - tolerance 的网格单元，
+    再在单元内逐次对分步幅，定位到第一个越过的网格点。压力随密度单调增加时与逐步扫描落在同一网格点
+    (返回相同的 iteration_count = k)，但只需 O(log k) 次压力计算。
+    legacy=True 时按原方式从 pm=0.01 逐步扫描 (每步一次压力计算)，用于核对结果。
+    过程信息通过 tracer 报告: 逐步扫描每 5000 次迭代报告一次，由粗到细扫描每次压力计算报告一次。
+    iteration_count 为网格点序号 k (与逐步扫描兼容)，并不等于压力计算次数；
+    实际的压力计算次数在结束时通过 tracer.evaluations 报告。
     """
-    # 将 numpy 数组转换为 python 列表 (如果需要)
-    if not isinstance(x, list):
-        x_list = x.tolist()
-    else:
-        x_list = x
-        
-    E_list, G_list, Q_list, F_list, S_list, W_list, K_list, M_list = E.tolist(), G.tolist(), Q.tolist(), F.tolist(), S.tolist(), W.tolist(), K.tolist(), M.tolist()
-    a_list, u_list, g_list, q_list, f_list, s_list, w_list = a.tolist(), u.tolist(), g.tolist(), q.tolist(), f.tolist(), s.tolist(), w.tolist()
+    tracer = resolve_tracer(tracer, log_callback)
+    trace_summary = tracer.level >= TRACE_SUMMARY
+    trace_iterations = tracer.level >= TRACE_ITERATIONS
+    # 组分相关的混合参数 (B 的组分加权和、F0/Q0/G0/U0/K0) 由 PreparedMixture 计算并缓存，
+    # 逐步扫描与由粗到细扫描使用同一组参数
+    mixture = prepare_mixture(x)
+    B_calc = float(mixture.second_virial(T))
+    F0, Q0, G0, U0, K0 = (float(v) for v in (mixture.F0, mixture.Q0, mixture.G0, mixture.U0, mixture.K0))
+
+    a_list, u_list, g_list, q_list, f_list = a.tolist(), u.tolist(), g.tolist(), q.tolist(), f.tolist()
     b_list, c_list, k_list = b.tolist(), c.tolist(), k.tolist()
-    Ex_list, Gx_list, Ux_list, Kx_list = Ex.tolist(), Gx.tolist(), Ux.tolist(), Kx.tolist()
-
-    # Part 1: 计算第二维利系数 B
-    B_calc = 0.0
-    for n in range(18):
-        ZJCS = T**(-u_list[n])
-        sum_val = 0
-        for i in range(N):
-            for j in range(N):
-                Eij = Ex_list[i][j] * math.sqrt(E_list[i] * E_list[j])
-                Gij = Gx_list[i][j] * (G_list[i] + G_list[j]) / 2
-                Bij = ((Gij + 1 - g_list[n])**g_list[n]) * \
-                      ((Q_list[i] * Q_list[j] + 1 - q_list[n])**q_list[n]) * \
-                      ((math.sqrt(F_list[i] * F_list[j]) + 1 - f_list[n])**f_list[n]) * \
-                      ((S_list[i] * S_list[j] + 1 - s_list[n])**s_list[n]) * \
-                      ((W_list[i] * W_list[j] + 1 - w_list[n])**w_list[n])
-                sum_val += x_list[i] * x_list[j] * Bij * (Eij**u_list[n]) * ((K_list[i] * K_list[j])**1.5)
-        B_calc += a_list[n] * ZJCS * sum_val
-
-    # Part 2 & 3: 计算中间变量
-    F0 = sum(x_list[i]**2 * F_list[i] for i in range(N))
-    Q0 = sum(x_list[i] * Q_list[i] for i in range(N))
-    sum1_G = sum(x_list[i] * G_list[i] for i in range(N))
-    G0_term = sum(x_list[i] * x_list[j] * (Gx_list[i][j] - 1) * (G_list[i] + G_list[j]) for i in range(N - 1) for j in range(i + 1, N))
-    G0 = sum1_G + G0_term
-    sum2_E = sum(x_list[i] * E_list[i]**2.5 for i in range(N))
-    U0_term = sum(x_list[i] * x_list[j] * (Ux_list[i][j]**5 - 1) * ((E_list[i] * E_list[j])**2.5) for i in range(N - 1) for j in range(i + 1, N))
-    U0 = (sum2_E**2 + U0_term)**0.2
-    sum1_K = sum(x_list[i] * K_list[i]**2.5 for i in range(N))
-    sum2_K_term = sum(x_list[i] * x_list[j] * (Kx_list[i][j]**5 - 1) * ((K_list[i] * K_list[j])**2.5) for i in range(N - 1) for j in range(i + 1, N))
-    K0 = (sum1_K**2 + 2 * sum2_K_term)**0.2
 
     # Part 4 & 5: 迭代计算压力 P
-    SUM1 = sum(a_list[n] * ((G0 + 1 - g_list[n])**g_list[n]) * (((Q0**2) + 1 - q_list[n])**q_list[n]) * \
-               ((F0 + 1 - f_list[n])**f_list[n]) * (U0**u_list[n]) * (T**(-u_list[n])) for n in range(12, 18))
+    # Cn 只与组分和温度有关，在扫描开始前一次性计算
+    Cn_list = [a_list[n] * ((G0 + 1 - g_list[n])**g_list[n]) * (((Q0**2) + 1 - q_list[n])**q_list[n]) * \
+               ((F0 + 1 - f_list[n])**f_list[n]) * (U0**u_list[n]) * (T**(-u_list[n])) for n in range(12, 58)]
+    SUM1 = sum(Cn_list[:6])
+    K0_3 = K0**3
+    series = list(zip(Cn_list, b_list[12:], c_list[12:], k_list[12:]))
 
-    if log_callback:
-        log_callback(f"开始压力迭代计算 (线性扫描, 步长: {step})...\n")
-    
-    iteration_count = 0
-    pm = 0.01
-    P = 0.0
-    
-    while iteration_count < max_iterations:
-        pr = (K0**3) * pm
+    def pressure(pm):
+        pr = K0_3 * pm
         SUM2 = 0
-        for n in range(12, 58):
-            Cn = a_list[n] * ((G0 + 1 - g_list[n])**g_list[n]) * \
-                 (((Q0**2) + 1 - q_list[n])**q_list[n]) * \
-                 ((F0 + 1 - f_list[n])**f_list[n]) * \
-                 (U0**u_list[n]) * (T**(-u_list[n]))
-            term = (b_list[n] - c_list[n] * k_list[n] * (pr**k_list[n])) * (pr**b_list[n]) * math.exp(-c_list[n] * (pr**k_list[n]))
+        for Cn, b_n, c_n, k_n in series:
+            term = (b_n - c_n * k_n * (pr**k_n)) * (pr**b_n) * math.exp(-c_n * (pr**k_n))
             SUM2 += Cn * term
-        P = pm * R * T * (1 + B_calc * pm - pr * SUM1 + SUM2)
-        
+        return pm * R * T * (1 + B_calc * pm - pr * SUM1 + SUM2), pr
+
+    if legacy:
+        if trace_summary:
+            tracer.message(f"开始压力迭代计算 (线性扫描, 步长: {step})...\n")
+
+        iteration_count = 0
+        pm = 0.01
+        P = 0.0
+
+        while iteration_count < max_iterations:
+            P, pr = pressure(pm)
+
+            if abs(P - P0) < tolerance:
+                break
+
+            pm += step
+            iteration_count += 1
+
+            if trace_iterations and iteration_count % 5000 == 0:
+                tracer.iteration(iteration_count, pm, P, abs(P - P0))
+        evaluations = min(iteration_count + 1, max_iterations)
+    else:
+        if trace_summary:
+            tracer.message(f"开始压力迭代计算 (由粗到细线性扫描, 步长: {step})...\n")
+
+        evaluations = 0
+        evaluated = {}
+
+        def grid_pressure(index):
+            # 返回网格点 index 处的 (P, pr)，同一网格点只计算一次
+            nonlocal evaluations
+            if index not in evaluated:
+                pm_k = 0.01 + index * step
+                evaluated[index] = pressure(pm_k)
+                evaluations += 1
+                if trace_iterations:
+                    tracer.iteration(evaluations, pm_k, evaluated[index][0], abs(evaluated[index][0] - P0))
+            return evaluated[index]
+
+        # 粗扫描: 步幅倍增，直到压力越过 P0 - tolerance (逐步扫描在此之前的网格点都不可能收敛)
+        last = max_iterations - 1
+        lo, hi, stride = -1, 0, 1
+        while grid_pressure(hi)[0] <= P0 - tolerance and hi < last:
+            lo, hi = hi, min(hi + stride, last)
+            stride *= 2
+        # 细扫描: 在 (lo, hi] 内对分，定位第一个越过的网格点
+        if grid_pressure(hi)[0] > P0 - tolerance:
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if grid_pressure(mid)[0] > P0 - tolerance:
+                    hi = mid
+                else:
+                    lo = mid
+
+        P, pr = grid_pressure(hi)
         if abs(P - P0) < tolerance:
-            break
-            
-        pm += step
-        iteration_count += 1
-        
-        if log_callback and iteration_count % 5000 == 0:
-            log_callback(f"  迭代 {iteration_count} 次, pm={pm:.6f}, P={P:.6f}, 差值={abs(P - P0):.10f}\n")
-
-    if iteration_count == max_iterations and log_callback:
-        log_callback("警告: 已达到最大迭代次数，结果可能不准确。\n")
-    elif log_callback:
-        log_callback(f"迭代完成，共 {iteration_count} 次。\n")
+            iteration_count = hi
+            pm = 0.01 + hi * step
+        else:
+            # 第一个越过的网格点已超出容差带 (步长过大) 或扫描范围内无解: 与逐步扫描一样走完全部网格
+            iteration_count = max_iterations
+            P, pr = grid_pressure(last)
+            pm = 0.01 + max_iterations * step
+
+    tracer.evaluations(evaluations)
+    if iteration_count == max_iterations and trace_summary:
+        tracer.message("警告: 已达到最大迭代次数，结果可能不准确。\n")
+    elif trace_summary and legacy:
+        tracer.message(f"迭代完成，共 {iteration_count} 次。\n")
+    elif trace_summary:
+        tracer.message(f"扫描完成: 落在第 {iteration_count} 个网格点，共计算压力 {evaluations} 次。\n")
 
     # Part 6: 计算最终结果
     Z = P0 / (pm * R * T)
-    M0 = sum(x_list[i] * M_list[i] for i in range(N))
-    p_density = M0 * pm
+    p_density = float(mixture.M0) * pm
 
     return Z, pm, pr, p_density, iteration_count
 
@@ -99,6 +130,9 @@ if __name__ == '__main__':
     
     print("\n--- 测试线性扫描法 (步长: 0.000001) ---")
     calculate_z_factor_linear_scan(T_in, P0_in, x_in, step=0.000001, log_callback=print)
+
+    print("\n--- 测试逐步线性扫描法 (legacy, 步长: 0.000001) ---")
+    calculate_z_factor_linear_scan(T_in, P0_in, x_in, step=0.000001, log_callback=print, legacy=True)
     
     print("\n--- 测试线性扫描法 (步长: 0.00001) ---")
     calculate_z_factor_linear_scan(T_in, P0_in, x_in, step=0.00001, log_callback=print)
\ No newline at end of file
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+时间序列的密度延拓求解模块。
+历史库与秒级遥测数据中相邻两行的温度、压力只差零点几 K / kPa，
+逐行调用求解器时每次都要从头确定有根区间。DensityTracker 为一条数据流保存上一次收敛的
+密度及压力方程的导数，用一阶延拓预测下一点的密度:
+
+    pm_pred = pm_prev + (ΔP - (∂P/∂T)_pm * ΔT) / (∂P/∂pm)_T
+
+从预测值出发做少量牛顿步 (通常 1~2 次压力计算即收敛)；
+牛顿步失效 (导数非正、密度越界或超过局部迭代上限) 时退回到带区间保护的完整求解。
+"""
+import numpy as np
+from constants import *
+from mixture import prepare_mixture
+from calculator import calculate_z_factor_newton
+
+
+class DensityTracker:
+    """
+    一条数据流 (固定组分) 的密度跟踪器。
+
+    tolerance: 压力收敛容差 (MPa)；max_iterations: 完整求解的最大迭代次数
+    max_local_iterations: 从延拓预测值出发的最大牛顿步数，超过后退回完整求解
+    warm_starts / fallbacks: 由延拓收敛 / 退回完整求解的点数；evaluations: 累计压力计算次数
+    """
+
+    def __init__(self, x, tolerance=0.00001, max_iterations=100, max_local_iterations=4):
+        self.mixture = prepare_mixture(x)
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.max_local_iterations = max_local_iterations
+        self.warm_starts = 0
+        self.fallbacks = 0
+        self.evaluations = 0
+        self.reset()
+
+    def reset(self):
+        """丢弃上一次的收敛状态 (数据流中断或跳变后调用)，下一点做完整求解。"""
+        self._state = None
+        self._last = None
+
+    def _state_at(self, T):
+        """同一温度的 IsothermalState 直接复用。"""
+        if self._state is None or self._state.T != T:
+            self._state = self.mixture.at_temperature(T)
+        return self._state
+
+    def _continue(self, state, P0):
+        """从上一收敛点延拓并做局部牛顿迭代，返回 (pm, pr, dP/dpm, dP/dT, 迭代次数)；失败时返回 None。"""
+        if state.has_multiple_roots(P0):
+            # 延拓只会停留在上一点所在的分支上，交给完整求解报错
+            return None
+        T_prev, P_prev, pm_prev, dPdpm_prev, dPdT_prev = self._last
+        pm = pm_prev + ((P0 - P_prev) - dPdT_prev * (state.T - T_prev)) / dPdpm_prev
+        for iteration in range(self.max_local_iterations):
+            if not pm > 0:
+                return None
+            P, dPdpm, dPdT, pr = state.pressure_derivatives(pm)
+            self.evaluations += 1
+            if dPdpm <= 0:
+                return None
+            if abs(P - P0) < self.tolerance:
+                return pm, pr, dPdpm, dPdT, iteration
+            pm -= (P - P0) / dPdpm
+        return None
+
+    def solve(self, T, P0):
+        """
+        计算下一点的压缩因子。返回 (Z, pm, pr, p_density, iteration_count)，与各求解器一致；
+        延拓收敛时 iteration_count 为局部牛顿步数 (首次计算即满足容差时为 0)。
+        """
+        state = self._state_at(T)
+        result = self._continue(state, P0) if self._last is not None else None
+        if result is not None:
+            self.warm_starts += 1
+            pm, pr, dPdpm, dPdT, iteration_count = result
+        else:
+            self.fallbacks += 1
+            _, pm, pr, _, iteration_count = calculate_z_factor_newton(
+                T, P0, self.mixture, max_iterations=self.max_iterations, tolerance=self.tolerance)
+            self.evaluations += iteration_count + 1
+            # 下一点的延拓需要收敛点处的导数
+            _, dPdpm, dPdT, _ = state.pressure_derivatives(pm)
+
+        self._last = (T, P0, pm, dPdpm, dPdT)
+        Z = P0 / (pm * R * T)
+        return Z, pm, pr, self.mixture.M0 * pm, iteration_count
+
+    def solve_series(self, T, P0):
+        """
+        按顺序计算一段序列 (T、P0 为等长数组或可广播的标量)。
+        无法求解的点 (ValueError) 记为 NaN 并重置跟踪状态。
+        返回 (Z, pm, pr, p_density, iteration_count)，均为数组。
+        """
+        T, P0 = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P0, dtype=float))
+        results = np.full((5, T.size), np.nan)
+        for i, (T_i, P_i) in enumerate(zip(T.ravel().tolist(), P0.ravel().tolist())):
+            try:
+                results[:, i] = self.solve(T_i, P_i)
+            except ValueError:
+                self.reset()
+        Z, pm, pr, p_density, iteration_count = (values.reshape(T.shape) for values in results)
+        return Z, pm, pr, p_density, iteration_count
+
+    def stats(self):
+        return {"warm_starts": self.warm_starts, "fallbacks": self.fallbacks, "evaluations": self.evaluations}
+
+
+if __name__ == '__main__':
+    import time
+    x_in = np.array([0.961651, 0.008606, 0.004567, 0.01998, 0.003859, 0,
+                     0, 0, 0, 0, 0, 0.000950, 0, 0.000138, 0.000249, 0, 0, 0, 0, 0, 0])
+    # 模拟秒级遥测: 温度、压力缓慢漂移并带有噪声
+    n = 20000
+    rng = np.random.default_rng(0)
+    T_in = 288.15 + np.cumsum(rng.normal(0, 0.02, n))
+    P_in = 6.0 + np.cumsum(rng.normal(0, 0.0005, n))
+
+    start = time.perf_counter()
+    Z_ref = np.array([calculate_z_factor_newton(T, P, x_in)[0] for T, P in zip(T_in, P_in)])
+    t_newton = time.perf_counter() - start
+
+    tracker = DensityTracker(x_in)
+    start = time.perf_counter()
+    Z, *_ = tracker.solve_series(T_in, P_in)
+    t_tracker = time.perf_counter() - start
+    print(f"逐点牛顿法 {t_newton:.2f} 秒，跟踪器 {t_tracker:.2f} 秒，最大差异 {np.max(np.abs(Z - Z_ref)):.2e}")
+    print(f"每点平均压力计算 {tracker.evaluations / n:.2f} 次，{tracker.stats()}")
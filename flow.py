@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+工况流量到标况流量的换算。
+    Q_base = Q_work * (P_work / P_base) * (T_base / T_work) * (Z_base / Z_work)
+工况与标况使用同一组分，组分相关的量 (PreparedMixture) 只预处理一次，两次求解共用。
+"""
+import numpy as np
+from calculator import calculate_z_factor_bisection
+from mixture import prepare_mixture
+
+# 默认标况: 20 °C, 101.325 kPa (与 gui.py 的默认值一致)
+T_BASE_DEFAULT = 293.15
+P_BASE_DEFAULT = 0.101325
+
+
+def standard_flow(Q_work, T_work, P_work, T_base, P_base, Z_work, Z_base):
+    """按换算公式由工况流量计算标况流量。Q_work 可以是标量或数组，压力单位只需一致。"""
+    return Q_work * (P_work / P_base) * (T_base / T_work) * (Z_base / Z_work)
+
+
+def convert_to_standard_flow(Q_work, T_work, P_work, x, T_base=T_BASE_DEFAULT, P_base=P_BASE_DEFAULT,
+                             solver=calculate_z_factor_bisection, **solver_kwargs):
+    """
+    求解工况与标况下的压缩因子并换算流量。
+
+    Q_work 为工况流量 (标量或数组，m³/h)；T 单位 K，P 单位 MPa；x 为21元组分数组或 PreparedMixture。
+    solver 为接受 PreparedMixture 的逐点求解器 (二分法、牛顿法或 Numba 牛顿法)，
+    solver_kwargs 原样传给求解器 (如 tolerance)。
+    返回 (Q_base, Z_work, Z_base)，Q_base 与 Q_work 同形状 (标量输入返回 float)。
+    """
+    mixture = prepare_mixture(x)
+    Z_work = solver(T_work, P_work, mixture, **solver_kwargs)[0]
+    Z_base = solver(T_base, P_base, mixture, **solver_kwargs)[0]
+    Q_base = standard_flow(np.asarray(Q_work, dtype=float), T_work, P_work, T_base, P_base, Z_work, Z_base)
+    if Q_base.ndim == 0:
+        Q_base = float(Q_base)
+    return Q_base, float(Z_work), float(Z_base)
@@ -5,8 +5,12 @@ import threading
 import time
 import queue
 
-from calculator import calculate_z_factor_bisection
+from calculator import calculate_z_factor_bisection, calculate_z_factor_newton
 from calculator_pure import calculate_z_factor_linear_scan
+from calculator_numba import calculate_z_factor_numba
+from flow import standard_flow
+from mixture import PreparedMixture
+from tracing import RingBufferTracer
 
 class GasCalculatorApp(tk.Tk):
     def __init__(self):
@@ -121,7 +125,7 @@ class GasCalculatorApp(tk.Tk):
         control_frame.columnconfigure(1, weight=1)
         
         ttk.Label(control_frame, text="选择求解方法:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        self.solver_method = ttk.Combobox(control_frame, values=["二分法", "线性扫描法"], state="readonly")
+        self.solver_method = ttk.Combobox(control_frame, values=["二分法", "牛顿法", "Numba牛顿法", "线性扫描法"], state="readonly")
         self.solver_method.current(0)
         self.solver_method.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
         self.solver_method.bind("<<ComboboxSelected>>", self.on_solver_change)
@@ -205,15 +209,18 @@ class GasCalculatorApp(tk.Tk):
                 entry.delete(0, tk.END)
                 entry.config(state="readonly")
             
+            # 工况与标况共用同一组分，组分相关的量只需预处理一次
+            mixture = PreparedMixture(x) if method in ("二分法", "牛顿法", "Numba牛顿法") else x
+
             # 创建并启动工况计算线程
             thread_work = threading.Thread(target=self.run_calculation_thread,
-                                           args=("工况", T_work, P_work, x, method, step, max_iters, tolerance),
+                                           args=("工况", T_work, P_work, mixture, method, step, max_iters, tolerance),
                                            daemon=True)
             thread_work.start()
 
             # 创建并启动标况计算线程
             thread_base = threading.Thread(target=self.run_calculation_thread,
-                                           args=("标况", T_base, P_base, x, method, step, max_iters, tolerance),
+                                           args=("标况", T_base, P_base, mixture, method, step, max_iters, tolerance),
                                            daemon=True)
             thread_base.start()
 
@@ -276,7 +283,7 @@ class GasCalculatorApp(tk.Tk):
             T_base = float(self.temp_base_entry.get())
             
             # 应用换算公式
-            Q_base = Q_work * (P_work / P_base) * (T_base / T_work) * (self.z_base / self.z_work)
+            Q_base = standard_flow(Q_work, T_work, P_work, T_base, P_base, self.z_work, self.z_base)
             
             # 更新UI
             self.flow_base_entry.config(state="normal")
@@ -296,13 +303,19 @@ class GasCalculatorApp(tk.Tk):
             self.log_queue.put(f"[{condition_name}] {message}")
 
         log_with_prefix(f"开始使用 {method} 进行计算 (T={T}K, P={P0}MPa)...\n")
+        # 概要信息即时显示；逐次迭代只记录在环形缓冲区中，计算结束后显示摘要
+        tracer = RingBufferTracer(capacity=256, message_callback=log_with_prefix)
         start_time = time.time()
         
         try:
             if method == "二分法":
-                Z, pm, pr, p_density, iters = calculate_z_factor_bisection(T, P0, x, max_iterations=max_iters, tolerance=tolerance, log_callback=log_with_prefix)
+                Z, pm, pr, p_density, iters = calculate_z_factor_bisection(T, P0, x, max_iterations=max_iters, tolerance=tolerance, tracer=tracer)
+            elif method == "牛顿法":
+                Z, pm, pr, p_density, iters = calculate_z_factor_newton(T, P0, x, max_iterations=max_iters, tolerance=tolerance, tracer=tracer)
+            elif method == "Numba牛顿法":
+                Z, pm, pr, p_density, iters = calculate_z_factor_numba(T, P0, x, max_iterations=max_iters, tolerance=tolerance, tracer=tracer)
             elif method == "线性扫描法":
-                Z, pm, pr, p_density, iters = calculate_z_factor_linear_scan(T, P0, x, step=step, max_iterations=max_iters, tolerance=tolerance, log_callback=log_with_prefix)
+                Z, pm, pr, p_density, iters = calculate_z_factor_linear_scan(T, P0, x, step=step, max_iterations=max_iters, tolerance=tolerance, tracer=tracer)
             else:
                 log_with_prefix("错误: 未知的求解方法\n")
                 return
@@ -312,6 +325,8 @@ class GasCalculatorApp(tk.Tk):
             duration = time.time() - start_time
 
             result_str = (
+                f"\n--- 迭代摘要 ---\n"
+                f"{tracer.summary()}"
                 f"\n计算完成！\n\n"
                 f"--- 详细结果 ---\n"
                 f"压缩因子 (Z): {Z:.6f}\n"
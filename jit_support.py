@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+可选的 Numba 支持。
+安装了 numba 时 jit_or_identity 把函数编译为本地代码并缓存到磁盘 (cache=True)，
+进程重启后无需重新编译；未安装时原样返回，调用方根据 NUMBA_AVAILABLE 选择 NumPy 实现。
+"""
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def jit_or_identity(func):
+    """有 numba 时以 numba.njit(cache=True) 编译 func，否则原样返回。"""
+    if NUMBA_AVAILABLE:
+        return numba.njit(cache=True)(func)
+    return func
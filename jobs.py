@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+后台任务模块。
+耗时较长的计算 (大网格扫描、线性扫描法等) 以任务形式提交: 立即返回任务 ID，
+之后可查询状态、订阅进度 (SSE) 或取消。任务在本进程的线程中执行，
+同时运行的任务数、排队上限及已完成任务的保留时间/数量均可配置。
+
+任务函数通过 job.set_progress 报告进度，通过 JobTracer (tracing.Tracer 的实现) 转发求解器的概要信息；
+取消是协作式的: 任务下一次报告进度或调用 job.check_cancelled() 时抛出 JobCancelled。
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+from tracing import Tracer, TRACE_ITERATIONS
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """任务已被取消。"""
+
+
+class JobQueueFull(Exception):
+    """排队中的任务数已达上限。"""
+
+
+class Job:
+    """
+    一个后台任务。progress 为 0~1 的完成比例，messages 只保留最近 max_messages 条概要信息。
+    状态的每次变化都会递增 version 并唤醒正在等待的进度订阅者。
+    """
+
+    def __init__(self, kind, params, max_messages=200):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.messages = []
+        self.max_messages = max_messages
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters = []
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def cancel(self):
+        """请求取消。排队中的任务不会再开始，运行中的任务在下一次报告进度时停止。"""
+        self._cancel.set()
+        self._touch()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"任务 {self.id} 已取消。")
+
+    def set_progress(self, progress):
+        self.check_cancelled()
+        self.progress = min(max(progress, 0.0), 1.0)
+        self._touch()
+
+    def add_message(self, text):
+        self.check_cancelled()
+        with self._lock:
+            self.messages.append(text)
+            del self.messages[:-self.max_messages]
+        self._touch()
+
+    def snapshot(self, include_result=True):
+        """返回任务状态的字典表示 (供 API 响应及进度事件使用)。"""
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "messages": list(self.messages[-20:]),
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+    def _set_status(self, status):
+        self.status = status
+        if status == JOB_RUNNING:
+            self.started_at = time.time()
+        elif status in FINISHED_STATES:
+            self.finished_at = time.time()
+        self._touch()
+
+    def _touch(self):
+        """记录一次状态变化，并 (线程安全地) 唤醒等待者。"""
+        with self._lock:
+            self.version += 1
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_for_change(self, version, timeout=None):
+        """等待 version 变化 (或超时)，返回当前 version。"""
+        event = asyncio.Event()
+        with self._lock:
+            if self.version != version:
+                return self.version
+            self._waiters.append((asyncio.get_running_loop(), event))
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version
+
+
+class JobTracer(Tracer):
+    """
+    将求解器的跟踪信息转给任务: 概要信息追加到 job.messages，迭代记录只用于检查取消请求，
+    使耗时长的单点求解也能及时取消。
+    迭代次数与求解的实际进度没有固定比例 (如由粗到细的线性扫描只计算几十次压力)，
+    任务进度由任务函数按已完成的点数报告。
+    """
+
+    def __init__(self, job, level=TRACE_ITERATIONS):
+        self.job = job
+        self.level = level
+
+    def message(self, text):
+        self.job.add_message(text)
+
+    def iteration(self, iteration, pm, P, residual, **kwargs):
+        self.job.check_cancelled()
+
+
+class JobManager:
+    """
+    进程内任务队列。
+
+    concurrency: 同时运行的最大任务数。
+    max_queued: 允许排队 (尚未开始) 的最大任务数，超出时 submit 抛出 JobQueueFull。
+    retention: 已完成任务的保留时间 (秒)；max_retained: 已完成任务的最大保留数量，超出时先删除最早完成的。
+    """
+
+    def __init__(self, concurrency=2, max_queued=100, retention=3600.0, max_retained=200):
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.retention = retention
+        self.max_retained = max_retained
+        self._jobs = OrderedDict()
+        self._semaphore = None
+        self._tasks = set()
+
+    def submit(self, kind, params, func, *args, **kwargs):
+        """
+        提交任务: func(job, *args, **kwargs) 在线程中执行，其返回值作为任务结果。
+        必须在事件循环中调用，返回 Job。
+        """
+        self.prune()
+        queued = sum(1 for job in self._jobs.values() if job.status == JOB_QUEUED)
+        if queued >= self.max_queued:
+            raise JobQueueFull(f"排队任务数已达上限 {self.max_queued}，请稍后重试。")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        job = Job(kind, params)
+        self._jobs[job.id] = job
+        task = asyncio.get_running_loop().create_task(self._run(job, func, args, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, func, args, kwargs):
+        async with self._semaphore:
+            if job._cancel.is_set():
+                job._set_status(JOB_CANCELLED)
+                return
+            job._set_status(JOB_RUNNING)
+            try:
+                job.result = await run_in_threadpool(func, job, *args, **kwargs)
+            except JobCancelled:
+                job._set_status(JOB_CANCELLED)
+                return
+            except Exception as e:
+                job.error = str(e)
+                job._set_status(JOB_FAILED)
+                return
+            job.progress = 1.0
+            job._set_status(JOB_SUCCEEDED)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        self.prune()
+        return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+        return job
+
+    def prune(self):
+        """删除超过保留时间或超出保留数量的已完成任务。"""
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished]
+        finished.sort(key=lambda job: job.finished_at)
+        excess = len(finished) - self.max_retained
+        for i, job in enumerate(finished):
+            if i < excess or (self.retention and now - job.finished_at > self.retention):
+                del self._jobs[job.id]
+
+    async def shutdown(self):
+        """取消所有未完成的任务并等待其结束。"""
+        for job in self._jobs.values():
+            if not job.finished:
+                job.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "max_queued": self.max_queued,
+            "retention": self.retention,
+            "max_retained": self.max_retained,
+            "jobs": counts,
+        }
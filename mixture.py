@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+"""
+混合物预处理模块。
+将 AGA8-92DC 模型中只与组分有关的量 (第二维利系数的组分加权和、G0/Q0/F0/U0/K0 等)
+一次性计算并缓存，之后在不同的 (T, P) 下求解时只需完成与温度、密度有关的计算。
+同一组分的 PreparedMixture 保存在进程内的 LRU 缓存中，跨调用复用。
+"""
+import copy
+
+import numpy as np
+from constants import *
+from cache import ResultCache
+from parameter_pack import PARAMS
+
+# 导出常数表统一来自 parameter_pack；SUM2 各项的常数取为模块级别名，供最内层循环直接使用
+_b_n, _c_n, _k_n, _ck_n = PARAMS.b_n, PARAMS.c_n, PARAMS.k_n, PARAMS.ck_n
+_PAIR_I, _PAIR_J = PARAMS.pair_i, PARAMS.pair_j
+
+# 组分相关参数 (PreparedMixture、mixture_parameters) 相对于原始 21x21 双重循环结果允许的相对偏差 (约 50 ulp)；
+# 上三角压缩合并了 (i, j)、(j, i) 两项且求和顺序不同，结果不保证逐位相同 (见 test_mixture.py)
+MIXTURE_RTOL = 1e-14
+
+# 检查等温线是否有多个根时的密度采样点 (mol/L)，覆盖各求解器默认的 [0, max_density=100] 区间
+ISOTHERM_GRID = np.linspace(0.0, 100.0, 129)[1:]
+
+
+class PreparedMixture:
+    """
+    由组分向量 x 构建的“预处理混合物”。
+
+    B_coeffs[n] 为第二维利系数第 n 项中与温度无关的部分:
+        B_coeffs[n] = sum_ij x_i x_j Bij_n Eij^u_n (Ki Kj)^1.5
+    其中与组分无关的常数在导入时按上三角压缩存储 (见 parameter_pack)。
+    因此 B(T) = sum_n a_n T^(-u_n) B_coeffs[n]。
+    压缩存储合并了 (i, j)、(j, i) 两项且求和顺序与原始双重循环不同，各参数与原始循环的结果
+    不保证逐位相同，相对偏差上限为 MIXTURE_RTOL。
+    """
+
+    def __init__(self, x):
+        x = np.array(x, dtype=float)
+        if x.shape != (N,):
+            raise ValueError(f"组分向量长度必须为 {N}，当前为 {x.shape}。")
+        if not np.all(np.isfinite(x)):
+            raise ValueError("组分向量中含有无效的摩尔分数 (NaN 或无穷大)。")
+        # 对象会被缓存共享，保存只读副本以免调用方修改原数组
+        x.flags.writeable = False
+        self.x = x
+        self._B_table = None
+        self._isotherm_terms = None
+
+        # 只在摩尔分数非零的组分 (及组分对) 上计算: 其余项对下列各求和的贡献恰为 0
+        self.active = np.flatnonzero(x)
+        xs = x[self.active]
+        xx = x[_PAIR_I] * x[_PAIR_J]
+        nz = np.flatnonzero(xx)
+        xx = xx[nz]
+
+        # Part 1: 第二维利系数 B 中与温度无关的部分 (上三角压缩常数表与 x_i*x_j 的加权和)
+        self.B_coeffs = PARAMS.B_pair[:, nz] @ xx
+
+        # Part 2: 计算 Cn 所需的中间变量
+        self.F0 = np.sum(xs**2 * F[self.active])
+        self.Q0 = np.sum(xs * Q[self.active])
+        self.G0 = np.sum(xs * G[self.active]) + np.dot(PARAMS.G0_pair[nz], xx)
+        sum2_E = np.sum(xs * E[self.active]**2.5)
+        self.U0 = (sum2_E**2 + np.dot(PARAMS.U0_pair[nz], xx))**0.2
+
+        # Part 3: 计算 K0
+        sum1_K = np.sum(xs * K[self.active]**2.5)
+        self.K0 = (sum1_K**2 + 2 * np.dot(PARAMS.K0_pair[nz], xx))**0.2
+
+        # 摩尔质量
+        self.M0 = np.sum(xs * M[self.active])
+
+    @property
+    def tabulated(self):
+        """是否为 tabulate_second_virial 返回的 B(T) 插值版本。"""
+        return self._B_table is not None
+
+    def _B_segment(self, T):
+        """T 落在 B(T) 表内时返回所在区间 (values[i], values[i+1], frac, step)，否则返回 None。"""
+        if self._B_table is None:
+            return None
+        T_min, step, values = self._B_table
+        pos = (T - T_min) / step
+        i = int(pos)
+        if 0 <= pos and i < len(values) - 1:
+            return values[i], values[i + 1], pos - i, step
+        return None
+
+    def second_virial(self, T):
+        """
+        计算温度 T 下的第二维利系数 B (18 项点积)。
+        由 tabulate_second_virial 得到的对象在 T 落在表内时改用线性插值。
+        """
+        segment = self._B_segment(T)
+        if segment is not None:
+            B_i, B_next, frac, _ = segment
+            return B_i + frac * (B_next - B_i)
+        return np.dot(PARAMS.a_B * T**(-PARAMS.u_B), self.B_coeffs)
+
+    def second_virial_array(self, T):
+        """second_virial 的数组版本 (供批量求解器使用)，表内各点同样取线性插值。"""
+        T = np.asarray(T, dtype=float)
+        B = (PARAMS.a_B * T[..., None]**(-PARAMS.u_B)) @ self.B_coeffs
+        if self._B_table is not None:
+            T_min, step, values = self._B_table
+            values = np.asarray(values)
+            pos = (T - T_min) / step
+            inside = (pos >= 0) & (pos < len(values) - 1)
+            i = pos[inside].astype(np.intp)
+            frac = pos[inside] - i
+            B[inside] = values[i] + frac * (values[i + 1] - values[i])
+        return B
+
+    def second_virial_derivative(self, T):
+        """
+        第二维利系数对温度的导数 dB/dT = -sum_n u_n a_n T^(-u_n-1) B_coeffs[n]。
+        插值版本在表内取所在区间的斜率，与 second_virial 给出的分段线性 B(T) 一致。
+        """
+        segment = self._B_segment(T)
+        if segment is not None:
+            B_i, B_next, _, step = segment
+            return (B_next - B_i) / step
+        return np.dot(-PARAMS.u_B * PARAMS.a_B * T**(-PARAMS.u_B - 1), self.B_coeffs)
+
+    def tabulate_second_virial(self, T_min=200.0, T_max=400.0, step=0.1):
+        """
+        返回一个新的 PreparedMixture: 在 [T_min, T_max] 上以 step (K) 为间距预先计算 B(T)，
+        其 second_virial 对表内温度做线性插值。
+        原对象可能经 MIXTURE_CACHE 被其他调用共享，因此不做修改；返回的对象也不放入缓存，
+        只有显式传入它的调用才使用插值。
+        B 随温度变化平缓，默认 0.1 K 间距下插值误差约为 2e-8 L/mol (相对误差 < 1e-6)，对 Z 的影响可忽略。
+        """
+        n_points = int(round((T_max - T_min) / step)) + 1
+        T_grid = T_min + step * np.arange(n_points)
+        values = (PARAMS.a_B * T_grid[:, None]**(-PARAMS.u_B)) @ self.B_coeffs
+        mixture = copy.copy(self)
+        mixture._B_table = (float(T_min), float(step), values.tolist())
+        return mixture
+
+    def isotherm_terms(self):
+        """压力方程在 ISOTHERM_GRID 上的线性展开 (见 isotherm_terms)，只与 K0 有关，首次调用时计算并保存。"""
+        if self._isotherm_terms is None:
+            self._isotherm_terms = isotherm_terms(self.K0**3)
+        return self._isotherm_terms
+
+    def at_temperature(self, T):
+        """返回该混合物在温度 T 下的 IsothermalState。"""
+        return IsothermalState(self, T)
+
+
+class IsothermalState:
+    """
+    混合物在固定温度 T 下的状态。
+    B、Cn (n=12..57)、SUM1 和 K0^3 只与组分和温度有关，在此一次性计算；
+    pressure / pressure_and_derivative 只做与密度有关的幂次和指数运算，是各求解器的最内层热点。
+    """
+
+    def __init__(self, mixture, T):
+        if not T > 0:
+            raise ValueError(f"温度必须为正数，当前为 T={T}。")
+        self.mixture = mixture
+        self.T = T
+        self.B = mixture.second_virial(T)
+        G0, Q0, F0, U0 = mixture.G0, mixture.Q0, mixture.F0, mixture.U0
+        p = PARAMS
+        self.Cn = p.a_n * ((G0 + 1 - p.g_n)**p.g_n) * \
+                  (((Q0**2) + 1 - p.q_n)**p.q_n) * \
+                  ((F0 + 1 - p.f_n)**p.f_n) * \
+                  (U0**p.u_n) * (T**(-p.u_n))
+        self.SUM1 = np.sum(self.Cn[:6])
+        self.K0_3 = mixture.K0**3
+        self._dB_dT = None
+        self._ambiguous = None
+
+    def pressure(self, pm):
+        """根据摩尔密度 pm 计算压力，返回 (P, pr)。"""
+        pr = self.K0_3 * pm
+        pr_k = pr**_k_n
+        term_vec = (_b_n - _ck_n * pr_k) * (pr**_b_n) * np.exp(-_c_n * pr_k)
+        SUM2 = np.sum(self.Cn * term_vec)
+        P = pm * R * self.T * (1 + self.B * pm - pr * self.SUM1 + SUM2)
+        return P, pr
+
+    def pressure_and_derivative(self, pm):
+        """
+        同时计算压力及其对摩尔密度的解析导数，返回 (P, dP/dpm, pr)。
+        SUM2 各项为 Cn*(b-c*k*pr^k)*pr^b*exp(-c*pr^k)，对 pr 求导后可写成闭式:
+            d(pm*SUM2)/dpm = sum Cn*pr^b*exp(-c*pr^k)*[(b-c*k*pr^k)*(1+b-c*k*pr^k) - c*k^2*pr^k]
+        """
+        pr = self.K0_3 * pm
+        pr_k = pr**_k_n
+        ck_pr_k = _ck_n * pr_k
+        base_vec = (pr**_b_n) * np.exp(-_c_n * pr_k)
+        SUM2 = np.sum(self.Cn * (_b_n - ck_pr_k) * base_vec)
+        dSUM2 = np.sum(self.Cn * ((_b_n - ck_pr_k) * (1 + _b_n - ck_pr_k) - ck_pr_k * _k_n) * base_vec)
+        P = pm * R * self.T * (1 + self.B * pm - pr * self.SUM1 + SUM2)
+        dPdpm = R * self.T * (1 + 2 * self.B * pm - 2 * pr * self.SUM1 + dSUM2)
+        return P, dPdpm, pr
+
+    def monotonic_pressure_and_derivative(self, pm):
+        """
+        同 pressure_and_derivative，但压力不是有限值或 dP/dpm <= 0 时抛出 ValueError。
+        区间内压力若不随密度单调增加 (S 形等温线)，区间内可能有多个根，
+        二分法与牛顿法会收敛到不同的根，因此各求解器每一步都用它检查单调性。
+        比较写成 not dPdpm > 0 的形式，使 NaN 也被判为无效 (与 calculator_batch 一致)。
+        """
+        P, dPdpm, pr = self.pressure_and_derivative(pm)
+        if not np.isfinite(P):
+            raise ValueError(f"在摩尔密度 pm={pm:.6f} 处压力计算结果无效 (P={P})，请检查温度与组分。")
+        if not dPdpm > 0:
+            raise ValueError(f"在摩尔密度 pm={pm:.6f} 处 dP/dpm={dPdpm:.6f} <= 0，压力不随密度单调变化 "
+                             f"(可能处于近临界或类液体区域)，无法可靠求解。")
+        return P, dPdpm, pr
+
+    def pressure_derivatives(self, pm):
+        """
+        同时计算压力、定温导数 dP/dpm 和定密度导数 dP/dT，返回 (P, dP/dpm, dP/dT, pr)。
+        Cn 与 T^(-u_n) 成正比 (dCn/dT = -u_n*Cn/T)，pr 与温度无关，因此
+            dP/dT = P/T + pm*R*T*(dB/dT*pm - pr*dSUM1/dT + dSUM2/dT)
+        """
+        if self._dB_dT is None:
+            self._dB_dT = self.mixture.second_virial_derivative(self.T)
+        pr = self.K0_3 * pm
+        pr_k = pr**_k_n
+        ck_pr_k = _ck_n * pr_k
+        base_vec = (pr**_b_n) * np.exp(-_c_n * pr_k)
+        term_vec = (_b_n - ck_pr_k) * base_vec
+        SUM2 = np.sum(self.Cn * term_vec)
+        dSUM2 = np.sum(self.Cn * ((_b_n - ck_pr_k) * (1 + _b_n - ck_pr_k) - ck_pr_k * _k_n) * base_vec)
+        dCn_dT = -PARAMS.u_n * self.Cn / self.T
+        RT = R * self.T
+        P = pm * RT * (1 + self.B * pm - pr * self.SUM1 + SUM2)
+        dPdpm = RT * (1 + 2 * self.B * pm - 2 * pr * self.SUM1 + dSUM2)
+        dPdT = P / self.T + pm * RT * (self._dB_dT * pm - pr * np.sum(dCn_dT[:6]) + np.sum(dCn_dT * term_vec))
+        return P, dPdpm, dPdT, pr
+
+    def has_multiple_roots(self, P0):
+        """
+        在 ISOTHERM_GRID 上采样该温度的等温线，判断目标压力 P0 是否对应多个密度 (见 multiple_roots)。
+        低温下富气等组分的等温线呈 S 形，此时不同初值或区间会收敛到不同的根，结果没有意义。
+        对应多个根的压力区间按温度计算一次并保存在对象上。
+        """
+        if self._ambiguous is None:
+            P_grid = isotherm_pressures(self.mixture.isotherm_terms(), self.T, self.B, self.SUM1, self.Cn, self.K0_3)
+            lower, upper = pressure_envelope(P_grid)
+            overlap = lower < upper
+            self._ambiguous = (lower[overlap], upper[overlap])
+        lower, upper = self._ambiguous
+        return bool(np.any((lower < P0) & (P0 < upper)))
+
+    def virial_density(self, P0):
+        """由第二维利系数修正的理想气体密度估计 pm = P0 / (R*T*(1 + B*pm_ideal))。"""
+        pm_ideal = P0 / (R * self.T)
+        Z_virial = 1 + self.B * pm_ideal
+        return pm_ideal / Z_virial if Z_virial > 0 else pm_ideal
+
+    def bracket(self, P0, pm_guess=None, rel_width=0.05, growth=2.0, max_density=100.0, interior_samples=8):
+        """
+        以 pm_guess (默认为 virial_density) 为中心寻找包含目标压力 P0 的密度区间。
+        区间初始半宽为 rel_width * pm_guess，向未包含根的一侧按 growth 倍几何扩展，直至压力变号。
+        扩展过程中若压力不随密度单调增加 (dP/dpm <= 0，近临界或类液体区域)，
+        或在 [0, max_density] 内找不到根，则抛出 ValueError。
+        P0 在该温度下对应多个密度 (has_multiple_roots) 时同样抛出 ValueError，不返回其中任意一个根。
+        发生过扩展时维利初值偏离较远，区间可能很宽，只检查端点不足以发现其内部的 S 形段，
+        因此再在区间内等距取 interior_samples 个点检查单调性。
+        返回 (pm_low, pm_high, evaluations)。
+        """
+        if not P0 > 0:
+            raise ValueError(f"目标压力必须为正数，当前为 P0={P0}。")
+        if self.has_multiple_roots(P0):
+            raise ValueError(f"T={self.T} K 下压力 P0={P0} MPa 对应多个密度 (等温线呈 S 形，可能处于两相区)，"
+                             f"无法确定唯一解。")
+        guess = self.virial_density(P0) if pm_guess is None else pm_guess
+        if not np.isfinite(guess):
+            raise ValueError(f"无法由 P0={P0} MPa 估计初始密度 (pm={guess})，请检查温度与组分。")
+        guess = min(max(guess, 1e-12), max_density)
+        width = rel_width
+
+        def evaluate(pm):
+            return self.monotonic_pressure_and_derivative(pm)[0]
+
+        pm_low, pm_high = guess * (1 - width), min(guess * (1 + width), max_density)
+        P_low, P_high = evaluate(pm_low), evaluate(pm_high)
+        evaluations = 2
+
+        # 上端扩展
+        while P_high < P0:
+            if pm_high >= max_density:
+                raise ValueError(f"在 [0, {max_density}] mol/L 内找不到压力 P0={P0} MPa 对应的密度。")
+            width *= growth
+            pm_next = min(guess * (1 + width), max_density)
+            P_next = evaluate(pm_next)
+            evaluations += 1
+            if not P_next > P_high:
+                raise ValueError(f"压力在密度区间 [{pm_high:.6f}, {pm_next:.6f}] 内不单调增加，无法可靠求解。")
+            pm_low, P_low = pm_high, P_high
+            pm_high, P_high = pm_next, P_next
+
+        # 下端扩展 (P(0) = 0 < P0，因此最多扩展到 0)
+        while P_low > P0:
+            width *= growth
+            pm_next = guess * (1 - width) if width < 1 else 0.0
+            P_next = evaluate(pm_next) if pm_next > 0 else 0.0
+            evaluations += 1
+            if not P_next < P_low:
+                raise ValueError(f"压力在密度区间 [{pm_next:.6f}, {pm_low:.6f}] 内不单调增加，无法可靠求解。")
+            pm_high, P_high = pm_low, P_low
+            pm_low, P_low = pm_next, P_next
+
+        if evaluations > 2 and interior_samples > 0:
+            P_prev = P_low
+            for pm in np.linspace(pm_low, pm_high, interior_samples + 2)[1:-1]:
+                P = evaluate(pm)
+                if not P > P_prev:
+                    raise ValueError(f"压力在密度区间 [{pm_low:.6f}, {pm_high:.6f}] 内不单调增加，无法可靠求解。")
+                P_prev = P
+            evaluations += interior_samples
+
+        return pm_low, pm_high, evaluations
+
+
+def isotherm_terms(K0_3, grid=ISOTHERM_GRID):
+    """
+    压力方程在密度网格 grid 上的线性展开，形状为 (len(grid), 48):
+        P(grid) = R*T * isotherm_terms @ [Cn, B - K0^3*SUM1, 1]
+    前 46 列为 pm*SUM2 各项 (不含 Cn)，后两列为 pm^2 与 pm。pr = K0^3*pm 与温度无关，因此可跨温度复用。
+    """
+    pr = K0_3 * grid[:, None]
+    pr_k = pr**_k_n
+    sum2_terms = grid[:, None] * (_b_n - _ck_n * pr_k) * (pr**_b_n) * np.exp(-_c_n * pr_k)
+    return np.column_stack([sum2_terms, grid**2, grid])
+
+
+def isotherm_pressures(terms, T, B, SUM1, Cn, K0_3):
+    """
+    由 isotherm_terms 的结果计算温度 T 下压力在网格上的取值 (一次矩阵乘法)。
+    T、B、SUM1 可为 (m,) 数组 (Cn 相应为 (m, 46))，此时返回 (m, len(grid)) 数组。
+    """
+    B, SUM1 = np.asarray(B, dtype=float), np.asarray(SUM1, dtype=float)
+    coef = np.concatenate([Cn, (B - K0_3 * SUM1)[..., None], np.ones(B.shape + (1,))], axis=-1)
+    return (R * np.asarray(T, dtype=float))[..., None] * (coef @ terms.T)
+
+
+def pressure_envelope(P_grid):
+    """
+    返回采样压力沿密度方向的后缀最小值与前缀最大值 (lower, upper)。
+    P(0) = 0，若存在 i < j 使 P_i > P0 > P_j，则压力先升过 P0 再降回其下，P0 至少对应两个密度；
+    这等价于某个采样点处 lower < P0 < upper。单调的等温线处处 lower == upper。
+    """
+    upper = np.maximum.accumulate(P_grid, axis=-1)
+    lower = np.minimum.accumulate(P_grid[..., ::-1], axis=-1)[..., ::-1]
+    return lower, upper
+
+
+def multiple_roots(P_grid, P0):
+    """
+    IsothermalState.has_multiple_roots 的向量化版本: P_grid 为 (m, n) 采样压力，返回 (m,) 布尔数组。
+    绝大多数等温线单调递增，只对有下降段的行计算 pressure_envelope。
+    """
+    P0 = np.asarray(P0, dtype=float)
+    result = np.zeros(P0.shape, dtype=bool)
+    loops = np.flatnonzero(np.any(P_grid[:, 1:] <= P_grid[:, :-1], axis=1))
+    if loops.size:
+        lower, upper = pressure_envelope(P_grid[loops])
+        P0_loops = P0[loops, None]
+        result[loops] = np.any((lower < P0_loops) & (P0_loops < upper), axis=1)
+    return result
+
+
+# 按组分缓存 PreparedMixture；站场组分通常数小时不变，命中时省去全部组分相关计算
+MIXTURE_CACHE = ResultCache(maxsize=256)
+
+
+def get_prepared_mixture(x):
+    """返回组分 x 对应的 PreparedMixture，优先从 MIXTURE_CACHE 中取 (以组分数组的字节内容为键)。"""
+    x = np.ascontiguousarray(x, dtype=float)
+    key = x.tobytes()
+    mixture = MIXTURE_CACHE.get(key)
+    if mixture is None:
+        mixture = PreparedMixture(x)
+        MIXTURE_CACHE.put(key, mixture)
+    return mixture
+
+
+def prepare_mixture(x):
+    """若 x 已是 PreparedMixture 则直接返回，否则经 get_prepared_mixture 取得 (或构建) 对应对象。"""
+    if isinstance(x, PreparedMixture):
+        return x
+    return get_prepared_mixture(x)
+
+
+def mixture_parameters(X):
+    """
+    对 (M, 21) 组分矩阵的每一行同时计算 PreparedMixture 中的组分相关量，不逐行构建对象。
+    组分对乘积 x_i*x_j 按上三角压缩为 (M, 231) 矩阵，与交互常数表的收缩各为一次矩阵乘法。
+    返回字典: B_coeffs (M, 18)，G0、Q0、F0、U0、K0、M0 (M,)。
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim != 2 or X.shape[1] != N:
+        raise ValueError(f"组分矩阵的形状必须为 (M, {N})，当前为 {X.shape}。")
+    XX = X[:, _PAIR_I] * X[:, _PAIR_J]
+    return {
+        "B_coeffs": XX @ PARAMS.B_pair.T,
+        "F0": X**2 @ F,
+        "Q0": X @ Q,
+        "G0": X @ G + XX @ PARAMS.G0_pair,
+        "U0": ((X @ E**2.5)**2 + XX @ PARAMS.U0_pair)**0.2,
+        "K0": ((X @ K**2.5)**2 + 2 * (XX @ PARAMS.K0_pair))**0.2,
+        "M0": X @ M,
+    }
+
+
+def blend_parameters(x_a, x_b, alpha, beta):
+    """
+    两种组分按 x = alpha*x_a + beta*x_b 混合 (如基础气与纯氢) 时，对一组 (alpha, beta) 同时计算混合物参数。
+    组分相关的各求和对 x 是一次或二次型，因此 x_a-x_a、x_a-x_b、x_b-x_b 三组和只需计算一次，
+    每个混合比例只是这些和以 (alpha^2, alpha*beta, beta^2) 或 (alpha, beta) 为权的组合。
+    返回字典格式与 mixture_parameters 相同 (每个混合比例一行)。
+    """
+    x_a = np.asarray(x_a, dtype=float)
+    x_b = np.asarray(x_b, dtype=float)
+    alpha = np.asarray(alpha, dtype=float).reshape(-1)
+    beta = np.asarray(beta, dtype=float).reshape(-1)
+    linear = np.stack([x_a, x_b])
+    pairs = np.stack([x_a[_PAIR_I] * x_a[_PAIR_J],
+                      x_a[_PAIR_I] * x_b[_PAIR_J] + x_b[_PAIR_I] * x_a[_PAIR_J],
+                      x_b[_PAIR_I] * x_b[_PAIR_J]])
+    squares = np.stack([x_a * x_a, 2 * x_a * x_b, x_b * x_b])
+    w1 = np.stack([alpha, beta], axis=1)
+    w2 = np.stack([alpha * alpha, alpha * beta, beta * beta], axis=1)
+    return {
+        "B_coeffs": w2 @ (pairs @ PARAMS.B_pair.T),
+        "F0": w2 @ (squares @ F),
+        "Q0": w1 @ (linear @ Q),
+        "G0": w1 @ (linear @ G) + w2 @ (pairs @ PARAMS.G0_pair),
+        "U0": ((w1 @ (linear @ E**2.5))**2 + w2 @ (pairs @ PARAMS.U0_pair))**0.2,
+        "K0": ((w1 @ (linear @ K**2.5))**2 + 2 * (w2 @ (pairs @ PARAMS.K0_pair)))**0.2,
+        "M0": w1 @ (linear @ M),
+    }
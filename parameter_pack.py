@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+导出参数包模块。
+constants.py 中的表格是 GB/T 17747.2 给出的原始数据；各求解器真正使用的是由其导出的常数表
+(上三角压缩的二元交互常数、n=12..57 的状态参数切片、批量求解的多项式系数矩阵等)。
+这些表只与 constants.py 有关，在导入时构建一次 (或从 .npz 文件加载) 并设为只读，
+作为 calculator*.py 和 mixture.py 的唯一来源，每次计算只需完成组分加权。
+"""
+import hashlib
+import os
+
+import numpy as np
+from constants import *
+
+# 参数包格式版本，导出表的定义变化时递增
+PACK_VERSION = 1
+
+# 批量求解的多项式展开: exp 类别 0 为无指数项 (c=0)，k=1..4 为 exp(-pr^k)；pr 的最高次数为 b + 2k = 13
+EXP_CLASSES = 5
+MAX_POWER = 14
+
+_SOURCE_TABLES = ("a", "b", "c", "k", "u", "g", "q", "f", "s", "w",
+                  "M", "E", "G", "Q", "K", "F", "S", "W", "Ex", "Gx", "Ux", "Kx")
+
+
+def constants_hash():
+    """constants.py 中全部原始表及 R 的 SHA-256 摘要，用于判断导出表是否过期。"""
+    digest = hashlib.sha256()
+    tables = globals()
+    for name in _SOURCE_TABLES:
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(tables[name], dtype=float).tobytes())
+    digest.update(np.float64(R).tobytes())
+    return digest.hexdigest()
+
+
+def _pair_tables():
+    """
+    把只与组分对 (i, j) 有关的常数压缩为上三角存储 (i <= j，共 N(N+1)/2 = 231 对)。
+    B 中各因子除 Gx 外都关于 (i, j) 对称，Gx 只在少数组分对上不对称，
+    因此非对角对存储 C_ij + C_ji，对角对存储 C_ii，B_coeffs 即为 231 个 x_i*x_j 的加权和。
+    G0/U0/K0 的交互项原本只取严格上三角 (i < j)，对角对的常数记为 0。
+    """
+    pair_i, pair_j = np.triu_indices(N)
+    off_diag = pair_i != pair_j
+
+    Eij = Ex * np.sqrt(np.outer(E, E))
+    Gij = Gx * np.add.outer(G, G) / 2
+    K_outer_pow1_5 = np.outer(K, K)**1.5
+    B_pair = np.empty((18, pair_i.size))
+    for n in range(18):
+        C = ((Gij + 1 - g[n])**g[n]) * \
+            ((np.outer(Q, Q) + 1 - q[n])**q[n]) * \
+            ((np.sqrt(np.outer(F, F)) + 1 - f[n])**f[n]) * \
+            ((np.outer(S, S) + 1 - s[n])**s[n]) * \
+            ((np.outer(W, W) + 1 - w[n])**w[n]) * \
+            (Eij**u[n]) * K_outer_pow1_5
+        B_pair[n] = C[pair_i, pair_j] + np.where(off_diag, C[pair_j, pair_i], 0.0)
+
+    G0_pair = np.where(off_diag, ((Gx - 1) * np.add.outer(G, G))[pair_i, pair_j], 0.0)
+    U0_pair = np.where(off_diag, ((Ux**5 - 1) * np.outer(E, E)**2.5)[pair_i, pair_j], 0.0)
+    K0_pair = np.where(off_diag, ((Kx**5 - 1) * np.outer(K, K)**2.5)[pair_i, pair_j], 0.0)
+    return {"pair_i": pair_i, "pair_j": pair_j, "B_pair": B_pair,
+            "G0_pair": G0_pair, "U0_pair": U0_pair, "K0_pair": K0_pair}
+
+
+def _series_tables():
+    """n=12..57 (Cn 与 SUM2 各项) 的状态参数切片，以及 B 的 18 项所用的 a、u。"""
+    n_range = np.arange(12, 58)
+    return {"a_B": a[:18].astype(float), "u_B": u[:18].astype(float),
+            "a_n": a[n_range].astype(float), "u_n": u[n_range].astype(float),
+            "g_n": g[n_range], "q_n": q[n_range], "f_n": f[n_range],
+            "b_n": b[n_range], "c_n": c[n_range], "k_n": k[n_range],
+            "ck_n": c[n_range] * k[n_range]}
+
+
+def _series_matrices():
+    """
+    将 SUM2 及 d(pm*SUM2)/dpm 的 46 项按 exp(-pr^k) 分组，展开为 pr 的多项式系数矩阵:
+        SUM2            = sum_e exp_e(pr) * sum_j (Cn @ P_mat)[e, j] * pr^j
+        d(pm*SUM2)/dpm  = sum_e exp_e(pr) * sum_j (Cn @ D_mat)[e, j] * pr^j
+    这样每次迭代只需计算 pr 的幂次和 4 个指数，而不必对 46 项逐一求幂和指数。
+    """
+    n_range = np.arange(12, 58)
+    P_mat = np.zeros((len(n_range), EXP_CLASSES, MAX_POWER))
+    D_mat = np.zeros((len(n_range), EXP_CLASSES, MAX_POWER))
+    for idx, n in enumerate(n_range):
+        bn, cn, kn = int(b[n]), int(c[n]), int(k[n])
+        e = kn if cn else 0
+        # (b - c*k*pr^k) * pr^b
+        P_mat[idx, e, bn] += bn
+        P_mat[idx, e, bn + kn] -= cn * kn
+        # [(b - c*k*pr^k)*(1 + b - c*k*pr^k) - c*k^2*pr^k] * pr^b
+        D_mat[idx, e, bn] += bn * (1 + bn)
+        D_mat[idx, e, bn + kn] -= cn * kn * (1 + 2 * bn) + cn * kn**2
+        D_mat[idx, e, bn + 2 * kn] += cn**2 * kn**2
+    return {"P_mat": P_mat.reshape(len(n_range), -1), "D_mat": D_mat.reshape(len(n_range), -1)}
+
+
+class ParameterPack:
+    """
+    只读的导出参数包。各表以属性方式访问 (如 PARAMS.B_pair)，数组均不可写。
+
+    pair_i, pair_j: 上三角组分对下标 (231)
+    B_pair: (18, 231) B 各项的组分对常数；G0_pair, U0_pair, K0_pair: (231) 交互项常数
+    a_B, u_B: B 的 18 项参数；a_n, u_n, g_n, q_n, f_n, b_n, c_n, k_n, ck_n: n=12..57 的参数
+    P_mat, D_mat: (46, EXP_CLASSES*MAX_POWER) 批量求解用的多项式系数矩阵
+    """
+
+    def __init__(self, tables, source_hash):
+        for name, value in tables.items():
+            value = np.array(value)
+            value.flags.writeable = False
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "names", tuple(tables))
+        object.__setattr__(self, "source_hash", source_hash)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ParameterPack 为只读对象。")
+
+    @classmethod
+    def build(cls):
+        """由 constants.py 构建参数包。"""
+        tables = {}
+        tables.update(_pair_tables())
+        tables.update(_series_tables())
+        tables.update(_series_matrices())
+        return cls(tables, constants_hash())
+
+    def save(self, path):
+        """保存为 .npz 文件 (附带格式版本与 constants.py 摘要)。"""
+        np.savez(path, pack_version=PACK_VERSION, source_hash=self.source_hash,
+                 **{name: getattr(self, name) for name in self.names})
+
+    @classmethod
+    def load(cls, path):
+        """
+        从 .npz 文件加载参数包。
+        文件格式版本或 constants.py 摘要与当前不一致时抛出 ValueError (应重新构建)。
+        """
+        with np.load(path) as data:
+            if int(data["pack_version"]) != PACK_VERSION:
+                raise ValueError(f"参数包 {path} 的格式版本为 {int(data['pack_version'])}，当前为 {PACK_VERSION}。")
+            source_hash = str(data["source_hash"])
+            if source_hash != constants_hash():
+                raise ValueError(f"参数包 {path} 由不同的 constants.py 生成，需要重新构建。")
+            tables = {name: data[name] for name in data.files if name not in ("pack_version", "source_hash")}
+        return cls(tables, source_hash)
+
+
+def _default_pack():
+    """环境变量 AGA8_PARAMETER_PACK 指向有效的 .npz 文件时从中加载，否则在导入时构建。"""
+    path = os.environ.get("AGA8_PARAMETER_PACK")
+    if path and os.path.exists(path):
+        try:
+            return ParameterPack.load(path)
+        except (ValueError, KeyError, OSError):
+            pass  # 文件过期或损坏时退回到重新构建
+    return ParameterPack.build()
+
+
+PARAMS = _default_pack()
+
+
+if __name__ == '__main__':
+    import sys
+    output = sys.argv[1] if len(sys.argv) > 1 else "aga8_parameters.npz"
+    PARAMS.save(output)
+    print(f"参数包已写入 {output} (constants.py 摘要 {PARAMS.source_hash[:12]})")
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+由收敛密度导出的热力学性质。
+求得摩尔密度后，压力方程在该状态下的解析导数只需再做一次压力计算 (IsothermalState.pressure_derivatives)，
+即可得到 dZ/dP、dZ/dT、等温压缩系数等，不必再用有限差分多次求解。
+
+单位: T K，P MPa，pm mol/L，质量密度 kg/m³，摩尔质量 g/mol。
+"""
+import math
+
+from constants import *
+from mixture import prepare_mixture
+
+
+class StateProperties:
+    """
+    一个状态点的求解结果及导出性质。可按 (Z, pm, pr, p_density, iteration_count) 解包，与各求解器的返回值兼容。
+
+    Z, pm, pr, p_density, iteration_count: 同求解器返回值
+    molar_mass: 混合物摩尔质量 (g/mol)
+    dP_dpm: 定温下压力对摩尔密度的导数 (MPa·L/mol)
+    dP_dT: 定密度下压力对温度的导数 (MPa/K)
+    dZ_dP: 定温下 Z 对压力的导数 (1/MPa)
+    dZ_dT: 定压下 Z 对温度的导数 (1/K)
+    dpm_dT: 定压下摩尔密度对温度的导数 (mol/(L·K))
+    isothermal_compressibility: 等温压缩系数 kappa_T = 1/(pm * dP/dpm) (1/MPa)
+    thermal_expansion: 体积膨胀系数 (dP/dT) / (pm * dP/dpm) (1/K)
+    isothermal_sound_speed: 等温声速 sqrt((dP/drho)_T) (m/s)。
+        真实声速还需要 cp/cv，constants.py 中没有理想气体比热数据，因此这里只给出等温部分。
+    """
+
+    def __init__(self, T, P, Z, pm, pr, iteration_count, molar_mass, dP_dpm, dP_dT):
+        self.T = T
+        self.P = P
+        self.Z = Z
+        self.pm = pm
+        self.pr = pr
+        self.p_density = molar_mass * pm
+        self.iteration_count = iteration_count
+        self.molar_mass = molar_mass
+        self.dP_dpm = dP_dpm
+        self.dP_dT = dP_dT
+        # Z = P/(pm*R*T)，定温时 dpm/dP = 1/(dP/dpm)，定压时 dpm/dT = -(dP/dT)/(dP/dpm)
+        self.dpm_dT = -dP_dT / dP_dpm
+        self.dZ_dP = 1 / (pm * R * T) - Z / (pm * dP_dpm)
+        self.dZ_dT = -Z / T - Z * self.dpm_dT / pm
+        self.isothermal_compressibility = 1 / (pm * dP_dpm)
+        self.thermal_expansion = dP_dT / (pm * dP_dpm)
+        # (dP/drho)_T = (dP/dpm)/M: MPa·L/g = 1e6 m²/s²
+        self.isothermal_sound_speed = math.sqrt(dP_dpm / molar_mass * 1e6) if dP_dpm > 0 else float('nan')
+
+    def __iter__(self):
+        return iter((self.Z, self.pm, self.pr, self.p_density, self.iteration_count))
+
+    def as_dict(self):
+        """导出性质的字典形式 (供 API 响应使用)。"""
+        return {name: float(getattr(self, name)) for name in (
+            "Z", "pm", "p_density", "molar_mass", "dP_dpm", "dP_dT", "dZ_dP", "dZ_dT", "dpm_dT",
+            "isothermal_compressibility", "thermal_expansion", "isothermal_sound_speed")}
+
+
+def state_properties(T, P0, x, pm, iteration_count=0, state=None):
+    """
+    由收敛的摩尔密度 pm 计算 StateProperties (一次压力及其解析导数计算)。
+    x 为21元组分数组或 PreparedMixture；已有该温度的 IsothermalState 时可通过 state 传入以免重复构建。
+    """
+    mixture = prepare_mixture(x)
+    if state is None:
+        state = mixture.at_temperature(T)
+    _, dP_dpm, dP_dT, pr = state.pressure_derivatives(pm)
+    Z = P0 / (pm * R * T)
+    return StateProperties(T, P0, Z, pm, pr, iteration_count, mixture.M0, dP_dpm, dP_dT)
+
+
+def solve_with_properties(solver, T, P0, x, **kwargs):
+    """
+    调用求解器 solver(T, P0, x, **kwargs) 并在其收敛密度处计算 StateProperties。
+    整个过程在同一次调用内完成，可作为一个任务交给进程池 (API 在 SOLVER_POOL 中调用)。
+    solver 须返回迭代收敛的密度；查表法的插值结果不适用。
+    """
+    mixture = prepare_mixture(x)
+    _, pm, _, _, iteration_count = solver(T, P0, mixture, **kwargs)
+    return state_properties(T, P0, mixture, pm, int(iteration_count))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+batch_cli 组分列解析的测试 (pytest)。
+"""
+import numpy as np
+
+from batch_cli import _component_column, solve_chunk
+
+OPTIONS = {
+    "temperature_column": "T",
+    "pressure_column": "P",
+    "pressure_unit": "MPa",
+    "composition_id_column": None,
+    "composition_table": None,
+    "max_iterations": 100,
+    "tolerance": 0.00001,
+    "passthrough_columns": [],
+}
+
+
+def test_nan_text_is_invalid_on_both_paths():
+    """文本 "nan" 无论整列能否直接转换都使该行无效；空单元格与 None 记为 0。"""
+    np.testing.assert_array_equal(_component_column(["0.01", "nan"]), [0.01, np.nan])
+    np.testing.assert_array_equal(_component_column(["", "nan", None, "abc"]), [0.0, np.nan, 0.0, np.nan])
+    np.testing.assert_array_equal(_component_column([0.01, None]), [0.01, 0.0])
+    np.testing.assert_array_equal(_component_column(np.array([0.01, np.nan])), [0.01, 0.0])
+
+
+def test_nan_row_does_not_depend_on_other_rows():
+    """两个数据块只差另一行的一个空单元格 (走不同的解析路径)，"nan" 所在行的结果应相同。"""
+    fast = {"T": ["300", "300"], "P": ["5", "5"], "CH4": ["0.95", "0.95"], "N2": ["nan", "0.05"]}
+    slow = {"T": ["300", "300"], "P": ["5", "5"], "CH4": ["0.95", "0.95"], "N2": ["nan", ""]}
+    out_fast, out_slow = solve_chunk(fast, OPTIONS), solve_chunk(slow, OPTIONS)
+    for out in (out_fast, out_slow):
+        assert out["converged"][0] == 0 and np.isnan(out["Z"][0])
+        assert out["converged"][1] == 1
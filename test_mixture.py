@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+混合物参数的测试 (pytest): 上三角压缩后的计算与原始 21x21 双重循环的结果在 MIXTURE_RTOL 内一致。
+"""
+import math
+
+import numpy as np
+import pytest
+
+from benchmark import COMPOSITIONS
+from constants import N, E, G, Q, F, S, W, K, Ex, Gx, Ux, Kx, u, g, q, f, s, w
+from mixture import MIXTURE_RTOL, PreparedMixture, mixture_parameters
+
+
+def _dense_mixture_parameters(x):
+    """按原始的 21x21 双重循环 (未做上三角压缩和零组分剔除) 计算混合物参数。"""
+    x = [float(v) for v in x]
+    E_l, G_l, Q_l, F_l, S_l, W_l, K_l = (v.tolist() for v in (E, G, Q, F, S, W, K))
+    Ex_l, Gx_l, Ux_l, Kx_l = Ex.tolist(), Gx.tolist(), Ux.tolist(), Kx.tolist()
+    u_l, g_l, q_l, f_l, s_l, w_l = (v.tolist() for v in (u, g, q, f, s, w))
+    B_coeffs = []
+    for n in range(18):
+        sum_val = 0
+        for i in range(N):
+            for j in range(N):
+                Eij = Ex_l[i][j] * math.sqrt(E_l[i] * E_l[j])
+                Gij = Gx_l[i][j] * (G_l[i] + G_l[j]) / 2
+                Bij = ((Gij + 1 - g_l[n])**g_l[n]) * \
+                      ((Q_l[i] * Q_l[j] + 1 - q_l[n])**q_l[n]) * \
+                      ((math.sqrt(F_l[i] * F_l[j]) + 1 - f_l[n])**f_l[n]) * \
+                      ((S_l[i] * S_l[j] + 1 - s_l[n])**s_l[n]) * \
+                      ((W_l[i] * W_l[j] + 1 - w_l[n])**w_l[n])
+                sum_val += x[i] * x[j] * Bij * (Eij**u_l[n]) * ((K_l[i] * K_l[j])**1.5)
+        B_coeffs.append(sum_val)
+    upper = [(i, j) for i in range(N - 1) for j in range(i + 1, N)]
+    G0 = sum(x[i] * G_l[i] for i in range(N)) + \
+        sum(x[i] * x[j] * (Gx_l[i][j] - 1) * (G_l[i] + G_l[j]) for i, j in upper)
+    U0 = (sum(x[i] * E_l[i]**2.5 for i in range(N))**2 +
+          sum(x[i] * x[j] * (Ux_l[i][j]**5 - 1) * ((E_l[i] * E_l[j])**2.5) for i, j in upper))**0.2
+    K0 = (sum(x[i] * K_l[i]**2.5 for i in range(N))**2 +
+          2 * sum(x[i] * x[j] * (Kx_l[i][j]**5 - 1) * ((K_l[i] * K_l[j])**2.5) for i, j in upper))**0.2
+    return {
+        "B_coeffs": np.array(B_coeffs),
+        "F0": sum(x[i]**2 * F_l[i] for i in range(N)),
+        "Q0": sum(x[i] * Q_l[i] for i in range(N)),
+        "G0": G0, "U0": U0, "K0": K0,
+    }
+
+
+def _random_compositions(count, seed=0):
+    """随机组分: 甲烷为主，其余组分随机置零 (覆盖零组分剔除的各种组合)。"""
+    rng = np.random.default_rng(seed)
+    X = rng.random((count, N)) * (rng.random((count, N)) < 0.5) * 0.1
+    X[:, 0] += 0.7
+    return X / X.sum(axis=1, keepdims=True)
+
+
+CASES = [(name, np.array(x) / np.sum(x)) for name, x in COMPOSITIONS.items()] + \
+        [(f"random-{i}", x) for i, x in enumerate(_random_compositions(8))]
+
+
+@pytest.mark.parametrize("x", [x for _, x in CASES], ids=[name for name, _ in CASES])
+def test_packed_mixing_matches_dense_loops(x):
+    """
+    PreparedMixture 与 mixture_parameters (批量求解器所用) 的各参数相对于原始循环的偏差不超过 MIXTURE_RTOL。
+    B_coeffs 按整个向量的最大绝对值归一化 (个别项可能接近 0)。
+    """
+    mixture = PreparedMixture(x)
+    rows = mixture_parameters(x[None, :])
+    for name, ref in _dense_mixture_parameters(x).items():
+        scale = np.max(np.abs(ref))
+        for value in (getattr(mixture, name), rows[name][0]):
+            assert np.max(np.abs(value - ref)) <= MIXTURE_RTOL * scale, name
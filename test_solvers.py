@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+各求解器的回归测试 (pytest)。
+以高精度二分法 (原始算法) 为参照，在组分 x 温度 x 压力网格上比较各加速求解器的结果，并检查各类报错。
+"""
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import z_table_store
+from benchmark import COMPOSITIONS
+from calculator import calculate_z_factor_bisection, calculate_z_factor_newton
+from calculator_batch import calculate_z_factor_batch
+from calculator_numba import calculate_z_factor_numba
+from calculator_pure import calculate_z_factor_linear_scan
+from density_tracker import DensityTracker
+from mixture import prepare_mixture
+from worker_pool import SolverPool, PoolSaturated
+from z_table import ZTable
+from z_table_store import ZTableStore, calculate_z_factor_table
+
+SCALAR_SOLVERS = [calculate_z_factor_bisection, calculate_z_factor_newton, calculate_z_factor_numba]
+
+TEMPERATURES = [273.15, 300.0, 330.0]  # K
+PRESSURES = [0.5, 2.0, 6.0, 10.0]     # MPa
+# 被测求解器的压力收敛容差；参照解用更严的容差，其误差可忽略
+TOLERANCE = 1e-9
+# 容差 TOLERANCE 下 Z 的相对误差约为 TOLERANCE / P0 (低压下 dlnP/dlnpm 约为 1)
+Z_RTOL = 1e-8
+
+
+def _reference(x, T, P0):
+    return calculate_z_factor_bisection(T, P0, x, max_iterations=200, tolerance=1e-11)[0]
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """参照解 {(组分名, T, P0): Z}。"""
+    return {(name, T, P0): _reference(x, T, P0)
+            for name, x in COMPOSITIONS.items() for T in TEMPERATURES for P0 in PRESSURES}
+
+
+@pytest.mark.parametrize("solver", SCALAR_SOLVERS[1:], ids=lambda solver: solver.__name__)
+@pytest.mark.parametrize("name", list(COMPOSITIONS))
+def test_scalar_solvers_match_bisection(reference, solver, name):
+    for T in TEMPERATURES:
+        for P0 in PRESSURES:
+            Z = solver(T, P0, COMPOSITIONS[name], tolerance=TOLERANCE)[0]
+            assert Z == pytest.approx(reference[(name, T, P0)], rel=Z_RTOL), (T, P0)
+
+
+@pytest.mark.parametrize("name", list(COMPOSITIONS))
+def test_batch_matches_bisection(reference, name):
+    Z, *_ = calculate_z_factor_batch(np.array(TEMPERATURES)[:, None], np.array(PRESSURES)[None, :],
+                                     COMPOSITIONS[name], tolerance=TOLERANCE)
+    expected = [[reference[(name, T, P0)] for P0 in PRESSURES] for T in TEMPERATURES]
+    np.testing.assert_allclose(Z, expected, rtol=Z_RTOL)
+
+
+@pytest.mark.parametrize("name", list(COMPOSITIONS))
+def test_tracker_matches_bisection(reference, name):
+    """跟踪器沿每条等温线按压力顺序延拓，结果与逐点参照解一致。"""
+    tracker = DensityTracker(COMPOSITIONS[name], tolerance=TOLERANCE)
+    T = np.repeat(TEMPERATURES, len(PRESSURES))
+    P0 = np.tile(PRESSURES, len(TEMPERATURES))
+    Z = tracker.solve_series(T, P0)[0]
+    np.testing.assert_allclose(Z, [reference[(name, T_i, P_i)] for T_i, P_i in zip(T, P0)], rtol=Z_RTOL)
+    assert tracker.warm_starts > 0
+
+
+@pytest.mark.parametrize("name", list(COMPOSITIONS))
+def test_linear_scan_matches_bisection(name):
+    """
+    由粗到细的线性扫描 (默认) 只在低压下可用 (网格上限 pm = 0.01 + 1e6*step)，
+    其结果为第一个 |P - P0| < tolerance 的网格点，Z 的相对误差约为 tolerance / P0。
+    """
+    x = np.array(COMPOSITIONS[name])
+    for T in (273.15, 330.0):
+        for P0 in (0.5, 1.0):
+            Z = calculate_z_factor_linear_scan(T, P0, x)[0]
+            assert Z == pytest.approx(_reference(x, T, P0), rel=1.5 * 0.00001 / P0), (T, P0)
+
+
+@pytest.mark.parametrize("name", ["lean", "sour"])
+@pytest.mark.parametrize("T, P0", [(273.15, 0.05), (330.0, 0.1)])
+def test_linear_scan_matches_legacy(name, T, P0):
+    """由粗到细的扫描与逐步扫描 (legacy=True) 落在同一网格点: iteration_count 相同，pm 只差累加的舍入误差。"""
+    x = np.array(COMPOSITIONS[name])
+    _, pm_legacy, _, _, k_legacy = calculate_z_factor_linear_scan(T, P0, x, legacy=True)
+    _, pm, _, _, k = calculate_z_factor_linear_scan(T, P0, x)
+    assert k == k_legacy
+    assert abs(pm - pm_legacy) <= 1e-13
+
+
+@pytest.fixture(scope="module")
+def lean_table():
+    return ZTable.build(COMPOSITIONS["lean"], (270.0, 335.0), (0.4, 10.5), max_error=1e-6)
+
+
+def test_z_table_matches_bisection(reference, lean_table):
+    for T in TEMPERATURES:
+        for P0 in PRESSURES:
+            assert abs(lean_table.lookup(T, P0) - reference[("lean", T, P0)]) <= 2e-6, (T, P0)
+
+
+def test_table_solver_uses_store(reference, lean_table, tmp_path, monkeypatch):
+    """表目录中有该组分的表时 calculate_z_factor_table 查表 (iteration_count 为 0)，包络外退回牛顿法。"""
+    store = ZTableStore(str(tmp_path))
+    store.put(lean_table)
+    monkeypatch.setattr(z_table_store, "DEFAULT_STORE", store)
+    x = COMPOSITIONS["lean"]
+    for T in TEMPERATURES:
+        for P0 in PRESSURES:
+            Z, _, _, _, iteration_count = calculate_z_factor_table(T, P0, x)
+            assert iteration_count == 0
+            assert abs(Z - reference[("lean", T, P0)]) <= 2e-6, (T, P0)
+    Z, _, _, _, iteration_count = calculate_z_factor_table(300.0, 12.0, x, tolerance=TOLERANCE)
+    assert iteration_count > 0
+    assert Z == pytest.approx(_reference(x, 300.0, 12.0), rel=Z_RTOL)
+
+
+@pytest.mark.parametrize("solver", SCALAR_SOLVERS, ids=lambda solver: solver.__name__)
+def test_non_monotonic_bracket_raises(solver):
+    """
+    富气在 200 K、13 MPa 下根唯一，但维利初值落在等温线的下降段上，
+    有根区间无法在单调的范围内确定: 报错而不是冒险迭代。批量求解器把该点记为 NaN。
+    """
+    x = COMPOSITIONS["rich"]
+    assert not prepare_mixture(x).at_temperature(200.0).has_multiple_roots(13.0)
+    with pytest.raises(ValueError, match="单调"):
+        solver(200.0, 13.0, x)
+    assert np.isnan(calculate_z_factor_batch(200.0, 13.0, x)[0])
+
+
+@pytest.mark.parametrize("solver", SCALAR_SOLVERS, ids=lambda solver: solver.__name__)
+def test_heavy_composition_raises(solver):
+    """重组分含量很高的随机组分在 273.15 K、12 MPa 下等温线非单调，各求解器都报 ValueError。"""
+    rng = np.random.default_rng(0)
+    for _ in range(1522):
+        x = rng.random(21) * rng.random(21)**3
+    with pytest.raises(ValueError):
+        solver(273.15, 12.0, x / x.sum())
+
+
+def test_saturated_pool_rejects():
+    """排队任务数达到上限时 SolverPool 拒绝新任务 (不提交到进程池)。"""
+    pool = SolverPool(workers=1, max_pending=1)
+    pool.start()
+    try:
+        pool.pending = pool.max_pending
+        with pytest.raises(PoolSaturated):
+            asyncio.run(pool.run(calculate_z_factor_newton, 300.0, 5.0, COMPOSITIONS["lean"]))
+        assert pool.stats()["rejected"] == 1
+    finally:
+        pool.pending = 0
+        pool.shutdown()
+
+
+def test_saturated_pool_returns_503(monkeypatch):
+    """API 把 PoolSaturated 转换为 503 并带 Retry-After。"""
+    pool = SolverPool(workers=1, max_pending=1)
+    pool.start()
+    pool.pending = pool.max_pending
+    monkeypatch.setattr(api, "SOLVER_POOL", pool)
+    try:
+        response = TestClient(api.app).post("/calculate", json={
+            "base_components": {"Methane": 0.9, "Nitrogen": 0.05, "Ethane": 0.05},
+            "hydrogen_fraction": 0.0, "T": 300.0, "P_kPa": 5000.0, "solver": "newton"})
+    finally:
+        pool.pending = 0
+        pool.shutdown()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.parametrize("solver", SCALAR_SOLVERS, ids=lambda solver: solver.__name__)
+@pytest.mark.parametrize("P0", [2.0, 8.0, 10.0])
+def test_multiple_roots_raise(solver, P0):
+    """富气在 200 K 下等温线呈 S 形，这些压力对应多个密度: 各求解器都应报错而不是返回其中一个根。"""
+    assert prepare_mixture(COMPOSITIONS["rich"]).at_temperature(200.0).has_multiple_roots(P0)
+    with pytest.raises(ValueError, match="多个密度"):
+        solver(200.0, P0, COMPOSITIONS["rich"])
+
+
+def test_multiple_roots_batch_and_tracker():
+    """批量求解把多根的点记为 NaN，跟踪器不沿上一点的分支延拓过去。"""
+    P0 = np.array([0.5, 2.0, 8.0, 10.0])
+    Z = calculate_z_factor_batch(200.0, P0, COMPOSITIONS["rich"])[0]
+    assert np.isfinite(Z[0]) and np.all(np.isnan(Z[1:]))
+
+    Z_series = DensityTracker(COMPOSITIONS["rich"]).solve_series(200.0, P0)[0]
+    np.testing.assert_array_equal(np.isnan(Z_series), np.isnan(Z))
+    assert Z_series[0] == pytest.approx(Z[0], rel=1e-9)
+
+
+def test_single_root_unaffected():
+    """等温线单调时不报错，且单根检查不改变结果。"""
+    state = prepare_mixture(COMPOSITIONS["rich"]).at_temperature(300.0)
+    assert not state.has_multiple_roots(8.0)
+    assert calculate_z_factor_newton(200.0, 0.5, COMPOSITIONS["rich"])[0] == pytest.approx(0.9521534467, rel=1e-9)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+求解过程跟踪模块。
+求解器只通过 Tracer 接口报告过程信息: 默认的 NULL_TRACER 不做任何事，
+关闭跟踪时热循环中只剩一次布尔判断；需要时可用 RingBufferTracer 以结构化数组记录最近的迭代。
+"""
+import numpy as np
+
+# 跟踪级别
+TRACE_OFF = 0         # 不输出任何信息
+TRACE_SUMMARY = 1     # 只输出开始、警告、完成等概要信息
+TRACE_ITERATIONS = 2  # 额外记录每次迭代
+
+# 迭代记录的结构; 某求解器没有的字段记为 NaN (如扫描法没有区间端点)
+ITERATION_DTYPE = np.dtype([
+    ("iteration", np.int64),
+    ("pm", np.float64),
+    ("pm_low", np.float64),
+    ("pm_high", np.float64),
+    ("P", np.float64),
+    ("dPdpm", np.float64),
+    ("residual", np.float64),
+])
+
+_NAN = float("nan")
+
+
+class Tracer:
+    """跟踪接口的空实现 (不记录任何信息)。"""
+    level = TRACE_OFF
+
+    def message(self, text):
+        """记录一条概要信息 (开始、警告、完成等)。"""
+
+    def iteration(self, iteration, pm, P, residual, pm_low=_NAN, pm_high=_NAN, dPdpm=_NAN):
+        """记录一次迭代。只有 level >= TRACE_ITERATIONS 时求解器才会调用。"""
+
+    def evaluations(self, count):
+        """
+        求解结束时报告压力方程的实际计算次数。与跟踪级别无关，求解器总会调用
+        (iteration_count 不等于计算次数的求解器，如由粗到细的线性扫描，靠它给出真实工作量)。
+        """
+
+
+NULL_TRACER = Tracer()
+
+
+class EvaluationCounter(Tracer):
+    """只记录压力方程计算次数的跟踪器 (供基准测试等统计工作量)。"""
+
+    def __init__(self):
+        self.count = None
+
+    def evaluations(self, count):
+        self.count = count
+
+
+class CallbackTracer(Tracer):
+    """
+    将信息格式化为文本并交给回调函数 (如 print)，与早期 log_callback 参数的行为一致。
+    """
+
+    def __init__(self, callback, level=TRACE_ITERATIONS):
+        self.callback = callback
+        self.level = level
+
+    def message(self, text):
+        self.callback(text)
+
+    def iteration(self, iteration, pm, P, residual, pm_low=_NAN, pm_high=_NAN, dPdpm=_NAN):
+        self.callback(_format_iteration(iteration, pm, P, residual, pm_low, pm_high, dPdpm))
+
+
+class RingBufferTracer(Tracer):
+    """
+    将最近 capacity 次迭代记录在预分配的结构化数组中 (每次迭代只做一次赋值)，
+    概要信息保存在 messages 中，并可同时转发给 message_callback。
+    """
+
+    def __init__(self, capacity=1024, level=TRACE_ITERATIONS, message_callback=None):
+        self.level = level
+        self.capacity = capacity
+        self.message_callback = message_callback
+        self.messages = []
+        self.count = 0
+        self._buffer = np.zeros(capacity, dtype=ITERATION_DTYPE)
+
+    def message(self, text):
+        self.messages.append(text)
+        if self.message_callback is not None:
+            self.message_callback(text)
+
+    def iteration(self, iteration, pm, P, residual, pm_low=_NAN, pm_high=_NAN, dPdpm=_NAN):
+        self._buffer[self.count % self.capacity] = (iteration, pm, pm_low, pm_high, P, dPdpm, residual)
+        self.count += 1
+
+    def records(self):
+        """按时间顺序返回缓冲区中保存的迭代记录 (结构化数组)。"""
+        if self.count <= self.capacity:
+            return self._buffer[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+    def summary(self, last=5):
+        """生成迭代过程的文本摘要: 总迭代次数、残差变化及最后几次迭代。"""
+        records = self.records()
+        if records.size == 0:
+            return "无迭代记录。\n"
+        lines = [f"共记录 {self.count} 次迭代 (缓冲区保留最近 {records.size} 次)，"
+                 f"残差 {records['residual'][0]:.3e} -> {records['residual'][-1]:.3e}\n"]
+        if self.count > last:
+            lines.append(f"  ... 最后 {last} 次迭代:\n")
+        for rec in records[-last:]:
+            lines.append(_format_iteration(rec["iteration"], rec["pm"], rec["P"], rec["residual"],
+                                           rec["pm_low"], rec["pm_high"], rec["dPdpm"]))
+        return "".join(lines)
+
+
+def _format_iteration(iteration, pm, P, residual, pm_low, pm_high, dPdpm):
+    text = f"  迭代 {iteration}: "
+    if not np.isnan(pm_low):
+        text += f"区间[{pm_low:.6f}, {pm_high:.6f}], "
+    text += f"pm={pm:.6f}, 计算P={P:.6f}, "
+    if not np.isnan(dPdpm):
+        text += f"dP/dpm={dPdpm:.6f}, "
+    return text + f"差值={residual:.10f}\n"
+
+
+def resolve_tracer(tracer=None, log_callback=None):
+    """
+    求解器参数的统一处理: 优先使用 tracer；只给出 log_callback 时包装为 CallbackTracer；
+    都未给出时返回 NULL_TRACER。
+    """
+    if tracer is not None:
+        return tracer
+    if log_callback is not None:
+        return CallbackTracer(log_callback)
+    return NULL_TRACER
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+求解器进程池模块。
+将求解器调用分发到 ProcessPoolExecutor，绕开 GIL 使 API 的吞吐量随 CPU 核数扩展；
+排队的任务数超过上限时拒绝新任务 (由 API 层转换为 HTTP 503)。
+"""
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+
+class PoolSaturated(Exception):
+    """进程池排队任务已达上限。"""
+
+
+def _init_worker():
+    """
+    工作进程初始化: 导入常量与求解器模块 (构建其导入期的系数表)，
+    并做一次预热计算 (含 Numba 内核的编译或从磁盘缓存加载)，使第一个请求不必承担这些开销。
+    """
+    from calculator import calculate_z_factor_newton
+    from calculator_batch import calculate_z_factor_batch
+    from calculator_numba import warmup
+    x = np.zeros(21)
+    x[0] = 1.0
+    calculate_z_factor_newton(288.15, 0.101325, x)
+    calculate_z_factor_batch(np.array([288.15]), np.array([0.101325]), x)
+    warmup()
+
+
+class SolverPool:
+    """
+    求解器执行池。
+
+    workers: 工作进程数，为 0 时不启用进程池，求解器在线程池中直接运行。
+    max_pending: 允许同时排队/执行的最大任务数，默认为 workers 的 4 倍。
+    """
+
+    def __init__(self, workers=0, max_pending=0):
+        self.workers = workers
+        self.max_pending = max_pending or 4 * workers
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, func, *args, **kwargs):
+        """在进程池 (或未启用时在线程池) 中执行 func(*args, **kwargs)。"""
+        if self._executor is None:
+            return await run_in_threadpool(func, *args, **kwargs)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated(f"计算服务繁忙 (排队任务数已达上限 {self.max_pending})，请稍后重试。")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "enabled": self._executor is not None,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
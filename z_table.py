@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+固定组分的 Z 查表模块。
+同一场站的组分在一段时间内不变，而每小时要在成千上万个 (T, P) 点上计算 Z。
+对这种场景，先用现有求解器在 T/P 包络上算出一张稠密的 Z 表，之后的查询只做双三次插值:
+
+    ZTable.build(x, (T_min, T_max), (P_min, P_max)) -> 建表并用二分法校验误差
+    table.lookup(T, P)                              -> Z (标量或数组)
+    table.density(T, P)                             -> (摩尔密度, 质量密度)
+
+表中每个节点保存 Z 及其对网格坐标的一阶导数和混合导数 (由三次样条确定)，
+查询时在所在网格单元上做双三次 Hermite 插值 (整体为 C1 连续的双三次样条曲面)。
+包络外的查询自动改用精确求解器。
+"""
+import numpy as np
+from constants import *
+from mixture import prepare_mixture
+from calculator import calculate_z_factor_bisection, calculate_z_factor_newton
+from calculator_batch import calculate_z_factor_batch
+from jit_support import NUMBA_AVAILABLE, jit_or_identity
+
+# 建表方法的版本 (节点求解器、样条端点条件等变化时递增)，写入磁盘表头用于判断表是否过期
+SOLVER_VERSION = "calculate_z_factor_batch/spline-1"
+
+# nodes 的 4 个分量: Z, dZ/dt, dZ/du, d2Z/dtdu (t、u 为以网格间距为单位的 T、P 坐标)
+_NODE_FIELDS = 4
+
+
+def _spline_slopes(y, axis):
+    """
+    沿 axis 方向求三次样条在等距节点 (单位间距) 上的一阶导数。
+    内部节点满足样条连续条件 d[i-1] + 4 d[i] + d[i+1] = 3 (y[i+1] - y[i-1])，
+    两端导数取四点单侧差分 (三阶精度)。
+    """
+    y = np.moveaxis(y, axis, 0)
+    n = y.shape[0]
+    d = np.empty_like(y)
+    d[0] = (-11 * y[0] + 18 * y[1] - 9 * y[2] + 2 * y[3]) / 6
+    d[-1] = (11 * y[-1] - 18 * y[-2] + 9 * y[-3] - 2 * y[-4]) / 6
+    rhs = 3 * (y[2:] - y[:-2])
+    rhs[0] -= d[0]
+    rhs[-1] -= d[-1]
+    A = 4 * np.eye(n - 2) + np.eye(n - 2, k=1) + np.eye(n - 2, k=-1)
+    d[1:-1] = np.linalg.solve(A, rhs.reshape(n - 2, -1)).reshape(rhs.shape)
+    return np.moveaxis(d, 0, axis)
+
+
+@jit_or_identity
+def _interpolate_point(nodes, T_min, T_inv_step, P_min, P_inv_step, T, P):
+    """
+    单点双三次 Hermite 插值，包络外返回 nan (由调用方改用精确求解器)。
+    """
+    n_T = nodes.shape[1]
+    n_P = nodes.shape[2]
+    t = (T - T_min) * T_inv_step
+    u = (P - P_min) * P_inv_step
+    if not (t >= 0.0 and t <= n_T - 1 and u >= 0.0 and u <= n_P - 1):
+        return np.nan
+    i = min(int(t), n_T - 2)
+    j = min(int(u), n_P - 2)
+    t -= i
+    u -= j
+    # Hermite 基函数: h0/h1 对应两端的函数值，k0/k1 对应两端的导数
+    t2 = t * t
+    u2 = u * u
+    ht1 = t2 * (3.0 - 2.0 * t)
+    ht0 = 1.0 - ht1
+    kt0 = t * (1.0 - t) * (1.0 - t)
+    kt1 = t2 * (t - 1.0)
+    hu1 = u2 * (3.0 - 2.0 * u)
+    hu0 = 1.0 - hu1
+    ku0 = u * (1.0 - u) * (1.0 - u)
+    ku1 = u2 * (u - 1.0)
+    z = 0.0
+    for a in range(2):
+        ha = ht0 if a == 0 else ht1
+        ka = kt0 if a == 0 else kt1
+        for b in range(2):
+            hb = hu0 if b == 0 else hu1
+            kb = ku0 if b == 0 else ku1
+            z += (ha * hb * nodes[0, i + a, j + b] + ka * hb * nodes[1, i + a, j + b] +
+                  ha * kb * nodes[2, i + a, j + b] + ka * kb * nodes[3, i + a, j + b])
+    return z
+
+
+@jit_or_identity
+def _lookup_kernel(nodes, T_min, T_inv_step, P_min, P_inv_step, T, P):
+    """对一维数组 T、P 逐点插值。"""
+    out = np.empty(T.shape[0])
+    for p in range(T.shape[0]):
+        out[p] = _interpolate_point(nodes, T_min, T_inv_step, P_min, P_inv_step, T[p], P[p])
+    return out
+
+
+def _lookup_numpy(nodes, T_min, T_inv_step, P_min, P_inv_step, T, P):
+    """_lookup_kernel 的 NumPy 实现 (未安装 numba 时使用)。"""
+    n_T, n_P = nodes.shape[1], nodes.shape[2]
+    t = (T - T_min) * T_inv_step
+    u = (P - P_min) * P_inv_step
+    inside = (t >= 0) & (t <= n_T - 1) & (u >= 0) & (u <= n_P - 1)
+    i = np.minimum(np.where(inside, t, 0).astype(np.intp), n_T - 2)
+    j = np.minimum(np.where(inside, u, 0).astype(np.intp), n_P - 2)
+    t = t - i
+    u = u - j
+    ht1 = t * t * (3 - 2 * t)
+    kt = (t * (1 - t) * (1 - t), t * t * (t - 1))
+    ht = (1 - ht1, ht1)
+    hu1 = u * u * (3 - 2 * u)
+    ku = (u * (1 - u) * (1 - u), u * u * (u - 1))
+    hu = (1 - hu1, hu1)
+    z = np.zeros(T.shape)
+    for a in range(2):
+        for b in range(2):
+            node = nodes[:, i + a, j + b]
+            z += ht[a] * hu[b] * node[0] + kt[a] * hu[b] * node[1] + ht[a] * ku[b] * node[2] + kt[a] * ku[b] * node[3]
+    return np.where(inside, z, np.nan)
+
+
+def _interpolate_numpy(nodes, T_min, T_inv_step, P_min, P_inv_step, T, P):
+    """_interpolate_point 的 NumPy 实现 (未安装 numba 时使用)。"""
+    return _lookup_numpy(nodes, T_min, T_inv_step, P_min, P_inv_step, np.array([T]), np.array([P]))[0]
+
+
+if NUMBA_AVAILABLE:
+    _lookup, _interpolate = _lookup_kernel, _interpolate_point
+else:
+    _lookup, _interpolate = _lookup_numpy, _interpolate_numpy
+
+
+class ZTable:
+    """
+    一个组分在 T/P 等距网格上的 Z 表。
+
+    nodes: (4, n_T, n_P) 数组，依次为 Z、dZ/dt、dZ/du、d2Z/dtdu (t、u 以网格间距为单位)
+    T_min, T_step, P_min, P_step: 网格轴 (K / MPa)
+    tolerance: 建表时求解器的压力收敛容差 (MPa)
+    error_bound: validate 在校验点上实测的最大插值误差 (未校验时为 None)
+    fallback: 包络外标量查询使用的精确求解器；fallback_count 记录改用精确求解的点数
+    """
+
+    def __init__(self, mixture, nodes, T_min, T_step, P_min, P_step, tolerance,
+                 error_bound=None, fallback=calculate_z_factor_newton):
+        self.mixture = prepare_mixture(mixture)
+        self.nodes = nodes
+        self.T_min = float(T_min)
+        self.T_step = float(T_step)
+        self.P_min = float(P_min)
+        self.P_step = float(P_step)
+        self.tolerance = float(tolerance)
+        self.error_bound = error_bound
+        self.fallback = fallback
+        self.fallback_count = 0
+        self._T_inv_step = 1.0 / self.T_step
+        self._P_inv_step = 1.0 / self.P_step
+
+    @property
+    def shape(self):
+        return self.nodes.shape[1:]
+
+    @property
+    def T_axis(self):
+        return self.T_min + self.T_step * np.arange(self.shape[0])
+
+    @property
+    def P_axis(self):
+        return self.P_min + self.P_step * np.arange(self.shape[1])
+
+    @property
+    def T_max(self):
+        return self.T_min + self.T_step * (self.shape[0] - 1)
+
+    @property
+    def P_max(self):
+        return self.P_min + self.P_step * (self.shape[1] - 1)
+
+    @classmethod
+    def tabulate(cls, x, T_range, P_range, T_step=1.0, P_step=0.1, tolerance=1e-10, max_iterations=100):
+        """
+        用批量求解器在网格节点上计算 Z 并确定样条导数 (不做误差校验)。
+        包络内有不收敛的节点 (如落入两相区) 时抛出 ValueError。
+        """
+        mixture = prepare_mixture(x)
+        n_T = int(round((T_range[1] - T_range[0]) / T_step)) + 1
+        n_P = int(round((P_range[1] - P_range[0]) / P_step)) + 1
+        if n_T < 4 or n_P < 4:
+            raise ValueError("Z 表在温度和压力方向上都至少需要 4 个节点。")
+        T_grid = T_range[0] + T_step * np.arange(n_T)
+        P_grid = P_range[0] + P_step * np.arange(n_P)
+        Z, _, _, _, iters = calculate_z_factor_batch(T_grid[:, None], P_grid[None, :], mixture,
+                                                     max_iterations=max_iterations, tolerance=tolerance)
+        if np.any(iters >= max_iterations) or not np.all(np.isfinite(Z)):
+            raise ValueError("Z 表包络内存在未收敛的节点，请缩小温度/压力范围。")
+
+        nodes = np.empty((_NODE_FIELDS, n_T, n_P))
+        nodes[0] = Z
+        nodes[1] = _spline_slopes(Z, 0)
+        nodes[2] = _spline_slopes(Z, 1)
+        nodes[3] = _spline_slopes(nodes[1], 1)
+        return cls(mixture, nodes, T_range[0], T_step, P_range[0], P_step, tolerance)
+
+    @classmethod
+    def build(cls, x, T_range, P_range, T_step=1.0, P_step=0.1, max_error=1e-6, tolerance=1e-10,
+              validation_points=200, max_refinements=3, seed=0):
+        """
+        建表并校验误差: 校验误差超过 max_error 时将两个方向的网格间距减半重建，
+        最多 max_refinements 次，仍不满足时抛出 ValueError。
+        返回的表 error_bound 为校验点上实测的最大插值误差 (<= max_error)。
+        """
+        for _ in range(max_refinements + 1):
+            table = cls.tabulate(x, T_range, P_range, T_step, P_step, tolerance)
+            if table.validate(validation_points, seed=seed) <= max_error:
+                return table
+            T_step /= 2
+            P_step /= 2
+        raise ValueError(f"Z 表加密 {max_refinements} 次后插值误差 {table.error_bound:.3e} "
+                         f"仍超过 {max_error:.3e}。")
+
+    def validate(self, validation_points=200, seed=0):
+        """
+        校验插值误差，返回并记录 error_bound (Z 的最大绝对误差)。
+        Hermite 插值的误差在单元中心附近最大: 全部单元中心与批量求解器的结果比较，
+        另取 validation_points 个点 (一半为单元中心，一半为随机点) 与 calculate_z_factor_bisection 比较。
+        """
+        T_axis, P_axis = self.T_axis, self.P_axis
+        T_mid = (T_axis[:-1] + T_axis[1:]) / 2
+        P_mid = (P_axis[:-1] + P_axis[1:]) / 2
+        T_grid, P_grid = np.meshgrid(T_mid, P_mid, indexing='ij')
+        Z_exact = calculate_z_factor_batch(T_grid, P_grid, self.mixture, tolerance=self.tolerance)[0]
+        error = np.max(np.abs(self.lookup(T_grid, P_grid) - Z_exact))
+
+        rng = np.random.default_rng(seed)
+        n_mid = validation_points // 2
+        pick = rng.choice(T_grid.size, size=min(n_mid, T_grid.size), replace=False)
+        T_check = np.concatenate([T_grid.ravel()[pick],
+                                  rng.uniform(self.T_min, self.T_max, validation_points - pick.size)])
+        P_check = np.concatenate([P_grid.ravel()[pick],
+                                  rng.uniform(self.P_min, self.P_max, validation_points - pick.size)])
+        Z_table = self.lookup(T_check, P_check)
+        for T, P, Z in zip(T_check, P_check, Z_table):
+            Z_ref = calculate_z_factor_bisection(T, P, self.mixture, tolerance=self.tolerance)[0]
+            error = max(error, abs(Z - Z_ref))
+
+        self.error_bound = float(error)
+        return self.error_bound
+
+    def contains(self, T, P):
+        return self.T_min <= T <= self.T_max and self.P_min <= P <= self.P_max
+
+    def lookup(self, T, P):
+        """
+        查询 Z。T、P 为 float 时走单点快速路径并返回 float，否则按数组处理，返回广播后形状的数组。
+        包络外的点改用精确求解器 (标量用 fallback，数组用批量求解器) 计算。
+        """
+        if isinstance(T, float) and isinstance(P, float):
+            Z = _interpolate(self.nodes, self.T_min, self._T_inv_step, self.P_min, self._P_inv_step, T, P)
+            if Z == Z:
+                return Z
+            self.fallback_count += 1
+            return float(self.fallback(T, P, self.mixture, tolerance=self.tolerance)[0])
+
+        T, P = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P, dtype=float))
+        shape = T.shape
+        T = np.ascontiguousarray(T.ravel())
+        P = np.ascontiguousarray(P.ravel())
+        Z = _lookup(self.nodes, self.T_min, self._T_inv_step, self.P_min, self._P_inv_step, T, P)
+        outside = np.flatnonzero(np.isnan(Z))
+        if outside.size:
+            self.fallback_count += outside.size
+            Z[outside] = calculate_z_factor_batch(T[outside], P[outside], self.mixture, tolerance=self.tolerance)[0]
+        return Z.reshape(shape)
+
+    def density(self, T, P):
+        """查询密度，返回 (摩尔密度 pm, 质量密度 p_density)，由 pm = P / (Z*R*T) 得到。"""
+        pm = np.asarray(P) / (self.lookup(T, P) * R * np.asarray(T))
+        p_density = self.mixture.M0 * pm
+        if np.ndim(pm) == 0:
+            return float(pm), float(p_density)
+        return pm, p_density
+
+
+if __name__ == '__main__':
+    import time
+    x_in = np.array([0.961651, 0.008606, 0.004567, 0.01998, 0.003859, 0,
+                     0, 0, 0, 0, 0, 0.000950, 0, 0.000138, 0.000249, 0, 0, 0, 0, 0, 0])
+    start = time.perf_counter()
+    table = ZTable.build(x_in, (263.15, 333.15), (0.1, 12.0))
+    print(f"建表 {table.shape[0]}x{table.shape[1]} 节点，耗时 {time.perf_counter() - start:.2f} 秒，"
+          f"校验误差 {table.error_bound:.2e}")
+
+    rng = np.random.default_rng(1)
+    n = 1000000
+    T_in = rng.uniform(263.15, 333.15, n)
+    P_in = rng.uniform(0.1, 12.0, n)
+    table.lookup(T_in[:10], P_in[:10])
+    start = time.perf_counter()
+    table.lookup(T_in, P_in)
+    duration = time.perf_counter() - start
+    print(f"数组查询 {n} 个点，每点 {duration / n * 1e9:.0f} ns")
+
+    table.lookup(300.0, 5.0)
+    m = 100000
+    start = time.perf_counter()
+    for i in range(m):
+        table.lookup(T_in[i], P_in[i])
+    duration = time.perf_counter() - start
+    print(f"标量查询每次 {duration / m * 1e6:.2f} us")
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Z 表的磁盘存储模块。
+为每个场站组分建表较耗时，多个 uvicorn 工作进程也不应各自建一份。
+Z 表可以离线预先计算并写入目录，服务启动时以 np.memmap 只读打开:
+各进程映射同一个文件，共享同一份物理内存页，无需建表即可查询。
+
+文件格式 (每个组分一个 .ztable 文件，文件名为组分摘要):
+    [0, 8)           魔数 b"AGA8ZTAB"
+    [8, 16)          表头长度 (小端 uint64)
+    [16, ...)        UTF-8 JSON 表头: 组分及其摘要、网格轴、建表方法版本、求解容差、
+                     校验误差、constants.py 摘要
+    [DATA_OFFSET, )  nodes 数组 (4, n_T, n_P)，小端 float64，C 顺序
+
+写入先写临时文件再 os.replace，读者不会看到写了一半的文件；
+已映射旧文件的进程继续使用旧数据，直到重新打开。
+constants.py 摘要或建表方法版本与当前不一致的文件视为过期 (load_table 抛出 ValueError，
+ZTableStore 按缺失处理并在 get_or_build 时重建)。
+
+离线预计算:
+    python z_table_store.py tables/ --compositions gas.json --T-range 263.15 333.15 --P-range 0.1 12
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+from constants import *
+from mixture import prepare_mixture
+from parameter_pack import constants_hash
+from z_table import ZTable, SOLVER_VERSION, _NODE_FIELDS
+from calculator import calculate_z_factor_newton
+
+MAGIC = b"AGA8ZTAB"
+FORMAT_VERSION = 1
+# 数据区起始位置按页对齐，便于按页映射
+DATA_OFFSET = 4096
+SUFFIX = ".ztable"
+
+# 组分摘要前先把摩尔分数量化到 1e-12，使归一化顺序不同带来的末位差异不影响查找
+_X_RESOLUTION = 1e-12
+
+
+def composition_hash(x):
+    """组分向量 (21元数组或 PreparedMixture) 的 SHA-256 摘要，用作表文件名。"""
+    x = prepare_mixture(x).x
+    quantized = np.rint(x / _X_RESOLUTION).astype('<i8')
+    return hashlib.sha256(quantized.tobytes()).hexdigest()
+
+
+def save_table(table, path):
+    """把 ZTable 原子地写入 path (先写同目录下的临时文件，再替换)。"""
+    header = {
+        "format_version": FORMAT_VERSION,
+        "composition_hash": composition_hash(table.mixture),
+        "x": table.mixture.x.tolist(),
+        "T_min": table.T_min, "T_step": table.T_step, "n_T": table.shape[0],
+        "P_min": table.P_min, "P_step": table.P_step, "n_P": table.shape[1],
+        "solver_version": SOLVER_VERSION,
+        "tolerance": table.tolerance,
+        "error_bound": table.error_bound,
+        "constants_hash": constants_hash(),
+    }
+    encoded = json.dumps(header).encode("utf-8")
+    if 16 + len(encoded) > DATA_OFFSET:
+        raise ValueError("Z 表表头过长。")
+    prefix = MAGIC + struct.pack("<Q", len(encoded)) + encoded
+    prefix += b"\0" * (DATA_OFFSET - len(prefix))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(prefix)
+            fp.write(np.ascontiguousarray(table.nodes, dtype='<f8').tobytes())
+            fp.flush()
+            os.fsync(fp.fileno())
+        # mkstemp 创建的文件只有属主可读，表文件需要能被其他服务进程读取
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_header(path):
+    """读取并返回表头字典；不是 Z 表文件时抛出 ValueError。"""
+    with open(path, "rb") as fp:
+        prefix = fp.read(16)
+        if len(prefix) != 16 or prefix[:8] != MAGIC:
+            raise ValueError(f"{path} 不是 Z 表文件。")
+        (length,) = struct.unpack("<Q", prefix[8:])
+        return json.loads(fp.read(length).decode("utf-8"))
+
+
+def load_table(path, fallback=calculate_z_factor_newton):
+    """
+    以 np.memmap 只读映射 path 中的 Z 表。
+    格式版本、建表方法版本或 constants.py 摘要与当前不一致，或组分与摘要不符时抛出 ValueError。
+    """
+    header = read_header(path)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path} 的格式版本为 {header.get('format_version')}，当前为 {FORMAT_VERSION}。")
+    if header.get("solver_version") != SOLVER_VERSION:
+        raise ValueError(f"{path} 由不同的建表方法 ({header.get('solver_version')}) 生成，需要重建。")
+    if header.get("constants_hash") != constants_hash():
+        raise ValueError(f"{path} 由不同的 constants.py 生成，需要重建。")
+    mixture = prepare_mixture(np.array(header["x"]))
+    if composition_hash(mixture) != header["composition_hash"]:
+        raise ValueError(f"{path} 的组分与表头摘要不一致。")
+
+    shape = (_NODE_FIELDS, header["n_T"], header["n_P"])
+    nodes = np.memmap(path, dtype='<f8', mode='r', offset=DATA_OFFSET, shape=shape)
+    # 以普通 ndarray 视图交给插值核函数，底层仍是同一块映射内存
+    return ZTable(mixture, np.asarray(nodes), header["T_min"], header["T_step"],
+                  header["P_min"], header["P_step"], header["tolerance"],
+                  error_bound=header["error_bound"], fallback=fallback)
+
+
+class ZTableStore:
+    """
+    Z 表目录。打开过的表按组分摘要缓存在进程内 (映射本身由操作系统在进程间共享)。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def _key(self, x):
+        """组分摘要 (按组分原始字节记忆，逐点查询时不必重复计算 SHA-256)。"""
+        mixture = prepare_mixture(x)
+        raw = mixture.x.tobytes()
+        key = self._keys.get(raw)
+        if key is None:
+            key = self._keys[raw] = composition_hash(mixture)
+        return key
+
+    def path_for(self, x):
+        return os.path.join(self.directory, self._key(x) + SUFFIX)
+
+    def get(self, x):
+        """返回该组分的 ZTable；文件不存在或已过期时返回 None。"""
+        key = self._key(x)
+        table = self._tables.get(key)
+        if table is not None:
+            return table
+        path = os.path.join(self.directory, key + SUFFIX)
+        try:
+            table = load_table(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            return self._tables.setdefault(key, table)
+
+    def put(self, table):
+        """写入 (或覆盖) 表文件，并使本进程后续查询使用新表。"""
+        os.makedirs(self.directory, exist_ok=True)
+        key = self._key(table.mixture)
+        save_table(table, os.path.join(self.directory, key + SUFFIX))
+        with self._lock:
+            self._tables.pop(key, None)
+        return self.get(table.mixture)
+
+    def get_or_build(self, x, T_range, P_range, max_error=1e-6, **build_kwargs):
+        """
+        返回覆盖 [T_range] x [P_range] 且校验误差不超过 max_error 的表；
+        没有合适的表 (缺失、过期、范围或精度不够) 时用 ZTable.build 建表并写入目录。
+        """
+        table = self.get(x)
+        if (table is not None and table.error_bound is not None and table.error_bound <= max_error
+                and table.T_min <= T_range[0] and table.T_max >= T_range[1]
+                and table.P_min <= P_range[0] and table.P_max >= P_range[1]):
+            return table
+        table = ZTable.build(x, T_range, P_range, max_error=max_error, **build_kwargs)
+        return self.put(table)
+
+    def stats(self):
+        files = [name for name in os.listdir(self.directory) if name.endswith(SUFFIX)] \
+            if os.path.isdir(self.directory) else []
+        return {"directory": self.directory, "files": len(files), "open": len(self._tables)}
+
+
+# 环境变量 AGA8_ZTABLE_DIR 指定的表目录 (未设置时为 None)，供 calculate_z_factor_table 使用
+DEFAULT_STORE = ZTableStore(os.environ["AGA8_ZTABLE_DIR"]) if os.environ.get("AGA8_ZTABLE_DIR") else None
+
+
+def calculate_z_factor_table(T, P0, x, max_iterations=100, tolerance=0.00001, log_callback=None, tracer=None):
+    """
+    查表计算天然气压缩因子Z。
+    DEFAULT_STORE 中有该组分的表且 (T, P0) 在包络内时直接插值 (iteration_count 记为 0)；
+    否则退回到 calculator.calculate_z_factor_newton。
+    返回 (Z, pm, pr, p_density, iteration_count)，与其他求解器一致。
+    """
+    mixture = prepare_mixture(x)
+    table = DEFAULT_STORE.get(mixture) if DEFAULT_STORE is not None else None
+    if table is None or not table.contains(T, P0):
+        return calculate_z_factor_newton(T, P0, mixture, max_iterations=max_iterations, tolerance=tolerance,
+                                         log_callback=log_callback, tracer=tracer)
+    Z = table.lookup(float(T), float(P0))
+    pm = P0 / (Z * R * T)
+    return Z, pm, mixture.K0**3 * pm, mixture.M0 * pm, 0
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from batch_cli import _load_composition_table
+
+    parser = argparse.ArgumentParser(description="离线预计算 Z 表并写入表目录")
+    parser.add_argument("directory", help="表目录 (服务端以 AGA8_ZTABLE_DIR 指向该目录)")
+    parser.add_argument("--compositions", required=True, help="组分表 JSON 文件: {ID: {组分名: 摩尔分数}}")
+    parser.add_argument("--T-range", type=float, nargs=2, default=[263.15, 333.15], metavar=("T_MIN", "T_MAX"))
+    parser.add_argument("--P-range", type=float, nargs=2, default=[0.1, 12.0], metavar=("P_MIN", "P_MAX"),
+                        help="压力范围 (MPa)")
+    parser.add_argument("--T-step", type=float, default=1.0)
+    parser.add_argument("--P-step", type=float, default=0.1)
+    parser.add_argument("--max-error", type=float, default=1e-6, help="Z 的最大插值误差")
+    args = parser.parse_args()
+
+    store = ZTableStore(args.directory)
+    for gas_id, x in _load_composition_table(args.compositions).items():
+        start = time.perf_counter()
+        table = store.get_or_build(x, args.T_range, args.P_range, max_error=args.max_error,
+                                   T_step=args.T_step, P_step=args.P_step)
+        print(f"{gas_id}: {os.path.basename(store.path_for(x))} {table.shape[0]}x{table.shape[1]} 节点，"
+              f"校验误差 {table.error_bound:.2e}，耗时 {time.perf_counter() - start:.2f} 秒")